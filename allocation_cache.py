@@ -0,0 +1,169 @@
+# allocation_cache.py
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+from main import RegisterAllocator
+
+
+def canonicalize(live_ranges):
+    """
+    Strip names and absolute offsets from a function's live ranges.
+    Returns (canonical, names): canonical is a tuple of (rank, start, end,
+    ...) entries in input order, shifted so the earliest start is 0 and
+    keeping any use count / loop depth / segments; names[i] is the caller's
+    name for canonical variable i. rank is the position of that name in
+    sorted order, since allocators break ties by name. Functions that differ
+    only by an order-preserving renaming and a constant offset get the same
+    canonical form.
+    """
+    live_ranges = list(live_ranges)
+    offset = min((live_range[1] for live_range in live_ranges), default=0)
+    names = [live_range[0] for live_range in live_ranges]
+    ranks = {name: rank for rank, name in enumerate(sorted(names))}
+    canonical = tuple((ranks[live_range[0]], *_shift(live_range, offset))
+                      for live_range in live_ranges)
+    return canonical, names
+
+
+def _shift(live_range, offset):
+    _, start, end, *weights = live_range
+    if len(weights) > 2 and weights[2] is not None:
+        weights[2] = tuple((seg_start - offset, seg_end - offset)
+                           for seg_start, seg_end in weights[2])
+    return (start - offset, end - offset, *weights)
+
+
+# Bumped whenever the stored entry layout changes, so old files are ignored
+CACHE_FORMAT = 2
+
+
+def cache_key(canonical, num_registers, mode):
+    payload = json.dumps([CACHE_FORMAT, mode, num_registers, canonical], separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class AllocationCache:
+    """
+    Content-addressed store of canonical allocations: an in-memory LRU
+    holding at most `max_entries` results, optionally backed by one JSON
+    file per key in `directory`, which survives between runs.
+    """
+    def __init__(self, max_entries=1024, directory=None):
+        self.max_entries = max_entries
+        self.directory = directory
+        self._entries = OrderedDict()  # key -> {"registers": [...], "pieces": [...]}
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".json")
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+        if self.directory is not None:
+            try:
+                with open(self._path(key)) as f:
+                    entry = json.load(f)
+            except FileNotFoundError:
+                pass
+            else:
+                self.hits += 1
+                self.disk_hits += 1
+                self._remember(key, entry)
+                return entry
+        self.misses += 1
+        return None
+
+    def put(self, key, entry):
+        self._remember(key, entry)
+        if self.directory is not None:
+            # Write then rename so concurrent readers never see a partial file
+            tmp_path = f"{self._path(key)}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, self._path(key))
+
+    def _remember(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class CachingRegisterAllocator:
+    """
+    Drop-in front end for RegisterAllocator that consults an AllocationCache.
+
+    On a miss the allocator runs on the caller's live ranges and the result
+    is stored by position. A miss therefore returns exactly what a cold
+    RegisterAllocator returns, and a hit returns that allocation mapped to
+    the new names. Split pieces (greedy mode) are stored as their variable's
+    position plus the shifted split points, and renamed the same way.
+    """
+    def __init__(self, num_registers, cache=None, backend="default", mode="timeline"):
+        self.num_registers = num_registers
+        self.cache = cache if cache is not None else AllocationCache()
+        self.backend = backend
+        self.mode = mode
+        self._live_ranges = None
+        self._canonical = None
+        self._names = None
+        self._offset = 0
+
+    def initialize(self, live_ranges):
+        self._live_ranges = list(live_ranges)
+        self._canonical, self._names = canonicalize(self._live_ranges)
+        self._offset = min((live_range[1] for live_range in self._live_ranges), default=0)
+
+    def allocate_registers(self):
+        key = cache_key(self._canonical, self.num_registers, self.mode)
+        entry = self.cache.get(key)
+        if entry is None:
+            entry = self._allocate()
+            self.cache.put(key, entry)
+        allocation = dict(zip(self._names, entry["registers"]))
+        for (index, points), reg in entry["pieces"]:
+            name = self._names[index] + "".join(f"_split_{point + self._offset}"
+                                                for point in points)
+            allocation[name] = reg
+        return allocation
+
+    def _allocate(self):
+        allocator = RegisterAllocator(self.num_registers, backend=self.backend, mode=self.mode)
+        allocator.initialize(self._live_ranges)
+        allocation = allocator.allocate_registers()
+        ids = {name: i for i, name in enumerate(self._names)}
+        pieces = [[self._piece_path(name, ids), reg]
+                  for name, reg in allocation.items() if name not in ids]
+        return {"registers": [allocation[name] for name in self._names], "pieces": pieces}
+
+    def _piece_path(self, name, ids):
+        """(index of the original variable, shifted split points) for a piece name"""
+        points = []
+        while name not in ids:
+            name, point = name.rsplit("_split_", 1)
+            points.append(int(point) - self._offset)
+        return [ids[name], points[::-1]]
@@ -0,0 +1,280 @@
+# benchmark.py
+"""
+Allocator benchmark suite.
+
+Runs every allocator over seeded synthetic workloads at several sizes and
+register counts, and reports wall time, peak traced memory, spill count,
+estimated spill loads/stores and interference-graph edge count as JSON. A
+previous JSON report can be passed as a baseline to fail the run on
+regressions.
+
+    python benchmark.py --sizes 100 1000 --output bench.json
+    python benchmark.py --baseline bench.json --tolerance 0.25
+"""
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+from interference_graph import Variable
+from main import RegisterAllocator
+from naive_allocator import NaiveAllocator
+from spill_cost import estimate_spill_traffic
+
+
+# =========================
+# Workload generators
+# =========================
+
+def short_temporaries(n, seed=0):
+    """Many short-lived temporaries spread over a straight-line body"""
+    rng = random.Random(seed)
+    length = 2 * n
+    live_ranges = []
+    for i in range(n):
+        start = rng.randrange(length)
+        live_ranges.append((f"v{i}", start, start + rng.randint(1, 8)))
+    return live_ranges
+
+
+def loop_heavy(n, seed=0):
+    """
+    Loops whose induction/accumulator variables span the whole body, plus
+    rarely used values live across whole loop nests. Ranges carry use
+    counts and loop depths for the spill-cost model.
+    """
+    rng = random.Random(seed)
+    live_ranges = []
+    point = 0
+    while len(live_ranges) < n:
+        body = rng.randint(100, 400)
+        if rng.random() < 0.5 and len(live_ranges) < n:
+            # Long-lived value read once after the loop
+            live_ranges.append((f"v{len(live_ranges)}", point, point + 2 * body, 1, 0))
+        loop_vars = min(rng.randint(2, 6), n - len(live_ranges))
+        for _ in range(loop_vars):
+            live_ranges.append((f"v{len(live_ranges)}", point, point + body, rng.randint(2, 8), 1))
+        temporaries = min(body // 4, n - len(live_ranges))
+        for _ in range(temporaries):
+            start = point + rng.randrange(body)
+            live_ranges.append((f"v{len(live_ranges)}", start, start + rng.randint(1, 6), 1, 1))
+        point += body + 1
+    return live_ranges
+
+
+def nested(n, seed=0):
+    """Properly nested intervals, as produced by structured scopes"""
+    rng = random.Random(seed)
+    live_ranges = []
+    open_ranges = []
+    point = 0
+    while len(live_ranges) < n:
+        if open_ranges and (len(open_ranges) >= 24 or rng.random() < 0.45):
+            name, start = open_ranges.pop()
+            live_ranges.append((name, start, point))
+        elif len(live_ranges) + len(open_ranges) < n:
+            open_ranges.append((f"v{len(live_ranges) + len(open_ranges)}", point))
+        point += 1
+    live_ranges.sort(key=lambda live_range: int(live_range[0][1:]))
+    return live_ranges
+
+
+def call_heavy(n, seed=0):
+    """Short values between call sites plus a few values live across calls"""
+    rng = random.Random(seed)
+    call_spacing = 20
+    length = 4 * n
+    live_ranges = []
+    for i in range(n):
+        start = rng.randrange(length)
+        if rng.random() < 0.2:
+            end = start + rng.randint(call_spacing, 10 * call_spacing)
+        else:
+            # Dies before the next call site
+            end = min(start + rng.randint(1, 6), start - start % call_spacing + call_spacing - 1)
+        live_ranges.append((f"v{i}", start, max(start, end)))
+    return live_ranges
+
+
+WORKLOADS = {
+    "short_temporaries": short_temporaries,
+    "loop_heavy": loop_heavy,
+    "nested": nested,
+    "call_heavy": call_heavy,
+}
+
+
+# =========================
+# Allocator runners
+# =========================
+
+# Each runner returns (allocation, edge count or None, spill traffic)
+
+def _register_allocator_runner(mode):
+    def run(live_ranges, num_registers):
+        allocator = RegisterAllocator(num_registers, mode=mode)
+        allocator.initialize(live_ranges)
+        allocation = allocator.allocate_registers()
+        return allocation, allocator.interference_graph.edge_count(), allocator.spill_traffic
+    return run
+
+
+def _run_naive(live_ranges, num_registers):
+    allocation = NaiveAllocator(num_registers).allocate_registers(live_ranges)
+    variables = {live_range[0]: Variable(*live_range) for live_range in live_ranges}
+    spilled = (var_name for var_name, reg in allocation.items() if reg == 'spilled')
+    return allocation, None, estimate_spill_traffic(variables, spilled)
+
+
+# name -> runner; every allocator runs at every size
+ALLOCATORS = {
+    "timeline": _register_allocator_runner("timeline"),
+    "linear_scan": _register_allocator_runner("linear_scan"),
+    "coloring": _register_allocator_runner("coloring"),
+    "greedy": _register_allocator_runner("greedy"),
+    "naive": _run_naive,
+}
+
+DEFAULT_SIZES = (100, 1000, 10000, 100000)
+DEFAULT_REGISTERS = (4, 8, 16)
+
+
+# =========================
+# Benchmark driver
+# =========================
+
+def measure(runner, live_ranges, num_registers, track_memory=True):
+    """Time one allocation, then repeat it under tracemalloc for peak memory"""
+    start = time.perf_counter()
+    allocation, edges, spill_traffic = runner(live_ranges, num_registers)
+    seconds = time.perf_counter() - start
+
+    peak_bytes = None
+    if track_memory:
+        tracemalloc.start()
+        try:
+            runner(live_ranges, num_registers)
+            peak_bytes = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    return {
+        "seconds": seconds,
+        "peak_bytes": peak_bytes,
+        "spills": sum(1 for reg in allocation.values() if reg == 'spilled'),
+        "spill_loads": spill_traffic['loads'],
+        "spill_stores": spill_traffic['stores'],
+        "edges": edges,
+    }
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, registers=DEFAULT_REGISTERS,
+                   allocators=None, workloads=None, seed=0, track_memory=True,
+                   progress=None):
+    """
+    Run every (workload, size, registers, allocator) combination.
+    Returns a JSON-serializable report.
+    """
+    allocators = list(allocators or ALLOCATORS)
+    workloads = list(workloads or WORKLOADS)
+    results = []
+    for workload in workloads:
+        for size in sizes:
+            live_ranges = WORKLOADS[workload](size, seed)
+            for num_registers in registers:
+                for name in allocators:
+                    runner = ALLOCATORS[name]
+                    result = {
+                        "workload": workload,
+                        "size": size,
+                        "registers": num_registers,
+                        "allocator": name,
+                    }
+                    result.update(measure(runner, live_ranges, num_registers, track_memory))
+                    results.append(result)
+                    if progress:
+                        progress(result)
+    return {
+        "meta": {
+            "seed": seed,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+
+
+def _result_key(result):
+    return (result["workload"], result["size"], result["registers"], result["allocator"])
+
+
+def compare_to_baseline(report, baseline, tolerance=0.25):
+    """
+    Compare a report with a stored baseline report.
+    Returns a list of human-readable regressions (empty if none). Time and
+    memory may grow by `tolerance` (a fraction); spill counts may not grow.
+    """
+    baseline_results = {_result_key(result): result for result in baseline["results"]}
+    regressions = []
+    for result in report["results"]:
+        key = _result_key(result)
+        old = baseline_results.get(key)
+        if old is None:
+            continue
+        label = "/".join(str(part) for part in key)
+        if result["seconds"] > old["seconds"] * (1 + tolerance):
+            regressions.append(f"{label}: time {old['seconds']:.6f}s -> {result['seconds']:.6f}s")
+        if (result["peak_bytes"] is not None and old.get("peak_bytes") is not None
+                and result["peak_bytes"] > old["peak_bytes"] * (1 + tolerance)):
+            regressions.append(f"{label}: peak memory {old['peak_bytes']} -> {result['peak_bytes']} bytes")
+        if result["spills"] > old["spills"]:
+            regressions.append(f"{label}: spills {old['spills']} -> {result['spills']}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the register allocators")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--registers", type=int, nargs="+", default=list(DEFAULT_REGISTERS))
+    parser.add_argument("--allocators", nargs="+", choices=sorted(ALLOCATORS))
+    parser.add_argument("--workloads", nargs="+", choices=sorted(WORKLOADS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--output", help="write the JSON report here (default: stdout)")
+    parser.add_argument("--baseline", help="JSON report to check for regressions against")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed relative growth in time and memory (default: 0.25)")
+    args = parser.parse_args(argv)
+
+    def progress(result):
+        print(f"{result['workload']:<18} n={result['size']:<7} R={result['registers']:<3} "
+              f"{result['allocator']:<15} {result['seconds']:.6f}s spills={result['spills']} "
+              f"spill_loads={result['spill_loads']}",
+              file=sys.stderr)
+
+    report = run_benchmarks(args.sizes, args.registers, args.allocators, args.workloads,
+                            args.seed, not args.no_memory, progress)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(report, baseline, args.tolerance)
+        for regression in regressions:
+            print("REGRESSION:", regression, file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
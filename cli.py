@@ -0,0 +1,133 @@
+# cli.py
+"""
+Command-line allocation driver.
+
+Reads live ranges as rows of (function, variable, start, end), allocates
+each function as soon as its rows have been read, and writes one JSON line
+per function:
+
+    {"function": "f1", "allocation": {"x": 0, "y": 1, "z": "spilled"}}
+
+Rows of one function must be contiguous. Only one function's live ranges
+are held in memory at a time.
+
+    python cli.py ranges.csv --registers 8 --mode linear_scan -o out.jsonl
+"""
+import argparse
+import csv
+import itertools
+import json
+import mmap
+import os
+import struct
+import sys
+
+from main import ALLOCATION_MODES, GRAPH_BACKENDS, RegisterAllocator
+
+# Binary format: 8-byte header (magic, version) followed by fixed-size
+# little-endian records of (function id, variable id, start, end). Variable
+# names are the decimal variable ids.
+BINARY_MAGIC = b"RALR"
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct("<4sI")
+BINARY_RECORD = struct.Struct("<QQqq")
+
+
+def read_csv(f):
+    """Yield (function, variable, start, end) rows from CSV, skipping a header"""
+    for row in csv.reader(f):
+        if not row or row[0] == "function":
+            continue
+        function_id, var_name, start, end = row
+        yield function_id, var_name, int(start), int(end)
+
+
+def read_jsonl(f):
+    """Yield rows from JSON lines with function/variable/start/end keys"""
+    for line in f:
+        if line.strip():
+            record = json.loads(line)
+            yield record["function"], record["variable"], record["start"], record["end"]
+
+
+def read_binary(path):
+    """Yield rows from a binary live-range file, read through mmap"""
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            magic, version = BINARY_HEADER.unpack_from(mm)
+            if magic != BINARY_MAGIC or version != BINARY_VERSION:
+                raise ValueError(f"{path}: not a version {BINARY_VERSION} live-range file")
+            view = memoryview(mm)[BINARY_HEADER.size:]
+            records = BINARY_RECORD.iter_unpack(view)
+            try:
+                for function_id, var_id, start, end in records:
+                    yield function_id, str(var_id), start, end
+            finally:
+                # Drop every export of the mapping before it is closed
+                del records
+                view.release()
+
+
+def write_binary(rows, f):
+    """Write (function id, variable id, start, end) integer rows in binary format"""
+    f.write(BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION))
+    for function_id, var_id, start, end in rows:
+        f.write(BINARY_RECORD.pack(function_id, int(var_id), start, end))
+
+
+def group_functions(rows):
+    """Yield (function_id, live_ranges) for each contiguous run of rows"""
+    for function_id, function_rows in itertools.groupby(rows, key=lambda row: row[0]):
+        yield function_id, [(var_name, start, end) for _, var_name, start, end in function_rows]
+
+
+def allocate_stream(rows, num_registers, mode="timeline", backend="default"):
+    """Yield (function_id, allocation) for each function in the row stream"""
+    for function_id, live_ranges in group_functions(rows):
+        allocator = RegisterAllocator(num_registers, backend=backend, mode=mode)
+        allocator.initialize(live_ranges)
+        yield function_id, allocator.allocate_registers()
+
+
+def _detect_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    return {".csv": "csv", ".jsonl": "jsonl", ".json": "jsonl"}.get(extension, "binary")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Allocate registers for streamed live ranges")
+    parser.add_argument("input", help="live-range file, or - for stdin (csv/jsonl only)")
+    parser.add_argument("-r", "--registers", type=int, required=True)
+    parser.add_argument("--format", choices=("csv", "jsonl", "binary"),
+                        help="input format (default: from the file extension)")
+    parser.add_argument("--mode", choices=ALLOCATION_MODES, default="timeline")
+    parser.add_argument("--backend", choices=sorted(GRAPH_BACKENDS), default="default")
+    parser.add_argument("-o", "--output", help="output file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    input_format = args.format or ("csv" if args.input == "-" else _detect_format(args.input))
+    if input_format == "binary" and args.input == "-":
+        parser.error("binary input must be a file")
+
+    output = open(args.output, "w") if args.output else sys.stdout
+    source = None
+    try:
+        if input_format == "binary":
+            rows = read_binary(args.input)
+        else:
+            source = sys.stdin if args.input == "-" else open(args.input, newline="")
+            rows = read_csv(source) if input_format == "csv" else read_jsonl(source)
+
+        for function_id, allocation in allocate_stream(rows, args.registers, args.mode, args.backend):
+            output.write(json.dumps({"function": function_id, "allocation": allocation}))
+            output.write("\n")
+    finally:
+        if source is not None and source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,21 @@
 # coalesce_handler.py
+from collections import deque
+
+from instrumentation import NULL_INSTRUMENTATION
+from interference_graph import normalize_segments, segments_overlap
+
+
 class CoalesceHandler:
-    def __init__(self, interference_graph):
+    def __init__(self, interference_graph, instrumentation=None):
         self.graph = interference_graph
+        self.instrumentation = instrumentation or NULL_INSTRUMENTATION
+        self.alias = {}  # coalesced variable -> variable it was merged into
         
     def can_coalesce(self, var1, var2):
         v1 = self.graph.variables[var1]
         v2 = self.graph.variables[var2]
-        # Check for overlap
-        return not (v1.start_point < v2.end_point and v2.start_point < v1.end_point)
+        # Check for overlap; one range may sit in a hole of the other
+        return not segments_overlap(v1.segments, v2.segments, strict=True)
 
         
     def coalesce_variables(self, var1_name, var2_name):
@@ -20,15 +28,120 @@ class CoalesceHandler:
             
         var1 = self.graph.variables[var1_name]
         var2 = self.graph.variables[var2_name]
-        
-        # Merge live ranges
-        var1.start_point = min(var1.start_point, var2.start_point)
-        var1.end_point = max(var1.end_point, var2.end_point)
-        
-        # Merge interference sets
-        for interfering_var in var2.interferences:
-            self.graph.add_interference(var1_name, interfering_var)
-            
+        segments = normalize_segments(var1.segments + var2.segments)
+
         # Remove var2
-        del self.graph.variables[var2_name]
+        self.graph.remove_variable(var2_name)
+        self.alias[var2_name] = var1_name
+
+        # Merge live ranges; a gap between the two stays a lifetime hole
+        self.graph.update_range(var1_name, segments[0][0], segments[-1][1], segments)
+
+        # Two segments may have merged into one, so take the interferences
+        # from the interval index rather than var2's neighbors
+        for start, end in segments:
+            for interfering_var in self.graph.overlapping(start, end):
+                self.graph.add_interference(var1_name, interfering_var)
+        self.instrumentation.count("coalesces")
         return True
+
+    def find(self, name):
+        """Variable that `name` has been coalesced into (itself if none)"""
+        root = name
+        while root in self.alias:
+            root = self.alias[root]
+        # Path compression
+        while name != root:
+            self.alias[name], name = root, self.alias[name]
+        return root
+
+    def coalesce_moves(self, moves, num_registers):
+        """
+        Conservatively coalesce copy-related variables.
+        moves: List of (variable_name, variable_name) move pairs
+        Returns: list of (kept, merged) pairs, in the order they were merged
+
+        A move is coalesced only if its ends do not interfere, ignoring an
+        edge that comes only from a shared end point: a copy's source may
+        die where its destination starts (as in can_coalesce). The merge
+        passes the George test (every significant neighbor of the merged
+        node already interferes with the kept one) or the Briggs test (the
+        combined node has fewer than num_registers significant neighbors),
+        so a graph colorable before coalescing stays colorable. Moves that
+        fail are retried once after the first pass, since later merges can
+        lower neighbor degrees. Each attempt costs O(degree), keeping the
+        pass near-linear in the size of the move list.
+        """
+        coalesced = []
+        worklist = deque(moves)
+        deferred = []
+        retried = False
+        while worklist:
+            move = worklist.popleft()
+            kept, merged = self.find(move[0]), self.find(move[1])
+            if (kept != merged and kept in self.graph.variables
+                    and merged in self.graph.variables
+                    and not self.graph.variables[kept].spilled
+                    and not self.graph.variables[merged].spilled
+                    and (not self.graph.interferes(kept, merged)
+                         or self.can_coalesce(kept, merged))):
+                # Fold the lower-degree node into the other; George then
+                # only walks the smaller neighbor set
+                if self.graph.degree(kept) < self.graph.degree(merged):
+                    kept, merged = merged, kept
+                if (self._george(kept, merged, num_registers)
+                        or self._briggs(kept, merged, num_registers)):
+                    self._merge(kept, merged)
+                    coalesced.append((kept, merged))
+                else:
+                    deferred.append(move)
+
+            if not worklist and deferred and coalesced and not retried:
+                worklist.extend(deferred)
+                deferred = []
+                retried = True
+        self.instrumentation.count("coalesces", len(coalesced))
+        return coalesced
+
+    def _george(self, kept, merged, num_registers):
+        for neighbor in self.graph.neighbors(merged):
+            if neighbor == kept:
+                continue
+            if (self.graph.degree(neighbor) >= num_registers
+                    and not self.graph.interferes(neighbor, kept)):
+                return False
+        return True
+
+    def _briggs(self, kept, merged, num_registers):
+        significant = 0
+        neighbors = set(self.graph.neighbors(kept)).union(self.graph.neighbors(merged))
+        for neighbor in neighbors - {kept, merged}:
+            degree = self.graph.degree(neighbor)
+            # A neighbor of both loses one edge when the two become one node
+            if self.graph.interferes(neighbor, kept) and self.graph.interferes(neighbor, merged):
+                degree -= 1
+            if degree >= num_registers:
+                significant += 1
+                if significant >= num_registers:
+                    return False
+        return True
+
+    def _merge(self, kept, merged):
+        """Move `merged`'s edges onto `kept` and alias it there"""
+        kept_var = self.graph.variables[kept]
+        merged_var = self.graph.variables[merged]
+        segments = normalize_segments(kept_var.segments + merged_var.segments)
+        for neighbor in list(self.graph.neighbors(merged)):
+            self.graph.add_interference(kept, neighbor)
+        self.graph.remove_variable(merged)
+        self.graph.update_range(kept, segments[0][0], segments[-1][1], segments)
+        self.alias[merged] = kept
+
+    def expand_allocation(self, allocation):
+        """Give every coalesced variable the register of the variable it was merged into"""
+        expanded = dict(allocation)
+        for name in self.alias:
+            root = self.find(name)
+            if root in allocation:
+                expanded[name] = allocation[root]
+        return expanded
@@ -0,0 +1,286 @@
+# compact_graph.py
+import heapq
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping
+
+from interference_graph import InterferenceGraph, check_segments
+from interval_index import IntervalIndex
+
+
+class CompactVariable:
+    """
+    Name-based view of one node of a CompactInterferenceGraph. It exposes
+    the same attributes as interference_graph.Variable but keeps no state of
+    its own; reads and writes go straight to the graph's arrays.
+    """
+    __slots__ = ("_graph", "_id")
+
+    def __init__(self, graph, var_id):
+        self._graph = graph
+        self._id = var_id
+
+    @property
+    def name(self):
+        return self._graph._names[self._id]
+
+    @property
+    def start_point(self):
+        return self._graph._starts[self._id]
+
+    @start_point.setter
+    def start_point(self, value):
+        self._graph._starts[self._id] = value
+
+    @property
+    def end_point(self):
+        return self._graph._ends[self._id]
+
+    @end_point.setter
+    def end_point(self, value):
+        self._graph._ends[self._id] = value
+
+    @property
+    def uses(self):
+        uses = self._graph._uses[self._id]
+        return None if uses < 0 else uses
+
+    @uses.setter
+    def uses(self, value):
+        self._graph._uses[self._id] = -1 if value is None else value
+
+    @property
+    def loop_depth(self):
+        return self._graph._loop_depth[self._id]
+
+    @loop_depth.setter
+    def loop_depth(self, value):
+        self._graph._loop_depth[self._id] = value
+
+    @property
+    def spilled(self):
+        return bool(self._graph._spilled[self._id])
+
+    @spilled.setter
+    def spilled(self, value):
+        self._graph._spilled[self._id] = 1 if value else 0
+
+    @property
+    def register(self):
+        return self._graph._registers[self._id]
+
+    @register.setter
+    def register(self, value):
+        self._graph._registers[self._id] = value
+
+    @property
+    def segments(self):
+        graph = self._graph
+        segments = graph._segments.get(self._id)
+        return segments or [(graph._starts[self._id], graph._ends[self._id])]
+
+    @segments.setter
+    def segments(self, value):
+        if len(value) > 1:
+            self._graph._segments[self._id] = value
+        else:
+            self._graph._segments.pop(self._id, None)
+
+    @property
+    def interferences(self):
+        """Snapshot of the neighbor names; update through the graph"""
+        return frozenset(self._graph.neighbors(self.name))
+
+
+class CompactVariables(Mapping):
+    """name -> CompactVariable mapping over the live nodes of the graph"""
+    def __init__(self, graph):
+        self._graph = graph
+
+    def __getitem__(self, name):
+        return CompactVariable(self._graph, self._graph._ids[name])
+
+    def __delitem__(self, name):
+        self._graph.remove_variable(name)
+
+    def __iter__(self):
+        return iter(self._graph._ids)
+
+    def __len__(self):
+        return len(self._graph._ids)
+
+    def __contains__(self, name):
+        return name in self._graph._ids
+
+
+class CompactInterferenceGraph(InterferenceGraph):
+    """
+    Interference graph keyed by dense integer IDs. Live ranges sit in typed
+    arrays (integer program points) and each node's adjacency is a sorted
+    array('l') of neighbor IDs, so a node costs a few machine words plus
+    one word per neighbor instead of a Variable object and a set of name
+    strings. Storage grows with the edge count, not with the largest ID,
+    and membership tests are binary searches. Only ranges with lifetime
+    holes keep a segment list.
+
+    IDs of removed variables are not reused; re-adding a name keeps its ID.
+    """
+    def __init__(self):
+        self._ids = {}        # name -> id
+        self._names = []      # id -> name (None once removed)
+        self._starts = array("q")
+        self._ends = array("q")
+        self._uses = array("l")       # -1 when unknown
+        self._loop_depth = array("l")
+        self._spilled = bytearray()
+        self._registers = []
+        self._adj = []        # id -> sorted array('l') of neighbor ids
+        self._segments = {}   # id -> segments, only for ranges with holes
+        self._edge_count = 0
+        self.index = IntervalIndex()
+        self.variables = CompactVariables(self)
+
+    def add_variable(self, name, start_point, end_point, uses=None, loop_depth=0,
+                     segments=None):
+        if segments is not None:
+            segments = check_segments(start_point, end_point, segments)
+        if uses is None:
+            uses = -1
+        var_id = self._ids.get(name)
+        if var_id is None:
+            var_id = len(self._names)
+            self._ids[name] = var_id
+            self._names.append(name)
+            self._starts.append(start_point)
+            self._ends.append(end_point)
+            self._uses.append(uses)
+            self._loop_depth.append(loop_depth)
+            self._spilled.append(0)
+            self._registers.append(None)
+            self._adj.append(array("l"))
+        else:
+            self._detach(var_id)
+            self._starts[var_id] = start_point
+            self._ends[var_id] = end_point
+            self._uses[var_id] = uses
+            self._loop_depth[var_id] = loop_depth
+            self._spilled[var_id] = 0
+            self._registers[var_id] = None
+        if segments and len(segments) > 1:
+            self._segments[var_id] = segments
+        else:
+            self._segments.pop(var_id, None)
+        self.index.insert(name, start_point, end_point)
+        return CompactVariable(self, var_id)
+
+    def remove_variable(self, name):
+        var_id = self._ids.pop(name)
+        self.index.discard(name)
+        self._detach(var_id)
+        self._segments.pop(var_id, None)
+        self._names[var_id] = None
+
+    @staticmethod
+    def _find(row, var_id):
+        """Position of var_id in the sorted row, or -1"""
+        i = bisect_left(row, var_id)
+        return i if i < len(row) and row[i] == var_id else -1
+
+    def _detach(self, var_id):
+        adj = self._adj
+        for neighbor in adj[var_id]:
+            del adj[neighbor][self._find(adj[neighbor], var_id)]
+        self._edge_count -= len(adj[var_id])
+        adj[var_id] = array("l")
+
+    def detach_variables(self, names):
+        """
+        Every row that loses an edge is filtered once, so the pass costs
+        the total degree of the batch plus that of its neighbors instead of
+        one array deletion per edge.
+        """
+        ids = {self._ids[name] for name in names}
+        adj = self._adj
+        incident = 0
+        internal = 0
+        touched = set()
+        for var_id in ids:
+            for neighbor in adj[var_id]:
+                if neighbor in ids:
+                    internal += 1
+                else:
+                    touched.add(neighbor)
+            incident += len(adj[var_id])
+            adj[var_id] = array("l")
+        for neighbor in touched:
+            adj[neighbor] = array("l", [other for other in adj[neighbor] if other not in ids])
+        removed = incident - internal // 2
+        self._edge_count -= removed
+        return removed
+
+    def add_interference(self, var1_name, var2_name):
+        id1 = self._ids.get(var1_name)
+        id2 = self._ids.get(var2_name)
+        if id1 is None or id2 is None or id1 == id2:
+            return
+        row = self._adj[id1]
+        i = bisect_left(row, id2)
+        if i == len(row) or row[i] != id2:
+            row.insert(i, id2)
+            other = self._adj[id2]
+            other.insert(bisect_left(other, id1), id1)
+            self._edge_count += 1
+
+    def remove_interference(self, var1_name, var2_name):
+        id1 = self._ids[var1_name]
+        id2 = self._ids[var2_name]
+        i = self._find(self._adj[id1], id2)
+        if i >= 0:
+            del self._adj[id1][i]
+            del self._adj[id2][self._find(self._adj[id2], id1)]
+            self._edge_count -= 1
+
+    def _build_sweep(self, live_ranges):
+        """
+        The sweep of InterferenceGraph._build_sweep on IDs. Each overlapping
+        pair of segments is appended to both rows without a membership
+        test, and every row is sorted once at the end (and deduplicated,
+        since two ranges with holes can meet in several segments), so the
+        build costs O(s log s + E log D) for maximum degree D.
+        """
+        ids = self._ids
+        adj = self._adj
+        variables = self.variables
+        names = dict.fromkeys(live_range[0] for live_range in live_ranges)
+        segments = sorted(((start, end, ids[name]) for name in names
+                           for start, end in variables[name].segments),
+                          key=lambda segment: segment[0])
+        active = []  # (end_point, id)
+        for start, end, var_id in segments:
+            # Endpoints are inclusive: a segment ending at `start` still overlaps
+            while active and active[0][0] < start:
+                heapq.heappop(active)
+            row = adj[var_id]
+            for _, other in active:
+                if other != var_id:
+                    row.append(other)
+                    adj[other].append(var_id)
+            heapq.heappush(active, (end, var_id))
+        for var_id, row in enumerate(adj):
+            if row:
+                adj[var_id] = array("l", sorted(set(row)))
+        self._edge_count = sum(len(row) for row in adj) // 2
+
+    def neighbors(self, name):
+        names = self._names
+        return [names[i] for i in self._adj[self._ids[name]]]
+
+    def degree(self, name):
+        return len(self._adj[self._ids[name]])
+
+    def interferes(self, var1_name, var2_name):
+        id1 = self._ids.get(var1_name)
+        id2 = self._ids.get(var2_name)
+        if id1 is None or id2 is None:
+            return False
+        return self._find(self._adj[id1], id2) >= 0
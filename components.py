@@ -0,0 +1,165 @@
+# components.py
+"""
+Connected-component decomposition for graph coloring.
+
+Variables in different components never interfere, so each component can
+be colored on its own and the colorings merged. A component with at most
+num_registers nodes is colored directly; the others each get their own
+GraphColoring run, optionally in a process pool.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from graph_coloring import GraphColoring
+from interference_graph import InterferenceGraph
+from spill_cost import DEFAULT_USES, estimate_spill_traffic, has_weights
+
+
+class UnionFind:
+    """Disjoint sets of hashable items with path halving and union by size"""
+    def __init__(self, items=()):
+        self.parent = {}
+        self.size = {}
+        for item in items:
+            self.add(item)
+
+    def add(self, item):
+        if item not in self.parent:
+            self.parent[item] = item
+            self.size[item] = 1
+
+    def find(self, item):
+        parent = self.parent
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    def union(self, item1, item2):
+        root1 = self.find(item1)
+        root2 = self.find(item2)
+        if root1 == root2:
+            return root1
+        if self.size[root1] < self.size[root2]:
+            root1, root2 = root2, root1
+        self.parent[root2] = root1
+        self.size[root1] += self.size[root2]
+        return root1
+
+
+def connected_components(graph):
+    """
+    Connected components of the unspilled variables of `graph`, as lists of
+    names. Components are ordered by their first variable in
+    graph.variables and list their members in that order. O(V + E α(V)).
+    """
+    names = [name for name, var in graph.variables.items() if not var.spilled]
+    sets = UnionFind(names)
+    for name in names:
+        for neighbor in graph.neighbors(name):
+            if neighbor in sets.parent:
+                sets.union(name, neighbor)
+    components = {}
+    for name in names:
+        components.setdefault(sets.find(name), []).append(name)
+    return list(components.values())
+
+
+def _subproblem(graph, component, weighted):
+    """Picklable description of one component: (name, start, end, uses, loop_depth, neighbors)"""
+    members = set(component)
+    nodes = []
+    for name in component:
+        var = graph.variables[name]
+        uses = var.uses
+        if weighted and uses is None:
+            # Keep the cost-based spill choice of the whole function even
+            # if this component carries no weights; the cost is unchanged
+            uses = DEFAULT_USES
+        nodes.append((name, var.start_point, var.end_point, uses, var.loop_depth,
+                      [neighbor for neighbor in graph.neighbors(name) if neighbor in members]))
+    return nodes
+
+
+def _color_subproblems(subproblems, num_registers):
+    """Color each subproblem on a graph of its own; returns [(colors, success, spills)]"""
+    results = []
+    for nodes in subproblems:
+        subgraph = InterferenceGraph()
+        for name, start, end, uses, loop_depth, _ in nodes:
+            subgraph.add_variable(name, start, end, uses, loop_depth)
+        for name, *_, neighbors in nodes:
+            for neighbor in neighbors:
+                subgraph.add_interference(name, neighbor)
+        coloring = GraphColoring(subgraph, num_registers)
+        success, spill_candidates = coloring.color_graph()
+        results.append((coloring.colors, success, spill_candidates))
+    return results
+
+
+def _chunk(subproblems, chunk_nodes):
+    """Group subproblems into lists holding at least chunk_nodes nodes"""
+    chunk = []
+    size = 0
+    for nodes in subproblems:
+        chunk.append(nodes)
+        size += len(nodes)
+        if size >= chunk_nodes:
+            yield chunk
+            chunk = []
+            size = 0
+    if chunk:
+        yield chunk
+
+
+def color_components(coloring, max_workers=0, chunk_nodes=2000):
+    """
+    Color coloring.graph one connected component at a time.
+    coloring: GraphColoring whose colors and spill_traffic are filled in,
+              as color_graph would
+    max_workers: 0 colors every component in this process; otherwise the
+                 components too large to color directly go to a process
+                 pool of that many workers (None: one per CPU), in chunks
+                 of at least chunk_nodes variables
+    Returns: (success, spill_candidates)
+    """
+    graph = coloring.graph
+    num_registers = coloring.num_registers
+    instrumentation = coloring.instrumentation
+    weighted = has_weights(graph.variables)
+
+    with instrumentation.phase("decompose"):
+        components = connected_components(graph)
+    large = []
+    for component in components:
+        if len(component) <= num_registers:
+            # Fewer nodes than registers: any distinct colors will do
+            for color, name in enumerate(component):
+                coloring.colors[name] = color
+        else:
+            large.append(_subproblem(graph, component, weighted))
+
+    with instrumentation.phase("color"):
+        if max_workers == 0 or len(large) < 2:
+            results = _color_subproblems(large, num_registers)
+        else:
+            workers = max_workers or os.cpu_count() or 1
+            chunks = list(_chunk(large, chunk_nodes))
+            with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as executor:
+                results = [result
+                           for chunk_results in executor.map(
+                               _color_subproblems, chunks, [num_registers] * len(chunks))
+                           for result in chunk_results]
+
+    success = True
+    spill_candidates = set()
+    for colors, component_success, component_spills in results:
+        coloring.colors.update(colors)
+        success = success and component_success
+        spill_candidates.update(component_spills)
+
+    coloring.spill_traffic = estimate_spill_traffic(graph.variables, spill_candidates)
+    instrumentation.count("components", len(components))
+    instrumentation.count("trivial_components", len(components) - len(large))
+    instrumentation.count("spill_candidates", len(spill_candidates))
+    return success, spill_candidates
@@ -0,0 +1,290 @@
+# csr_graph.py
+import heapq
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping
+
+from interference_graph import EdgeView, segments_overlap
+from interval_index import IntervalIndex
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; build_csr falls back to pure Python
+    np = None
+
+
+class CSRVariable:
+    """Read-mostly view of one node of a CSRInterferenceGraph"""
+    __slots__ = ("_graph", "_id")
+
+    def __init__(self, graph, var_id):
+        self._graph = graph
+        self._id = var_id
+
+    @property
+    def name(self):
+        return self._graph.names[self._id]
+
+    @property
+    def start_point(self):
+        return int(self._graph.starts[self._id])
+
+    @property
+    def end_point(self):
+        return int(self._graph.ends[self._id])
+
+    @property
+    def segments(self):
+        return self._graph._segments.get(self._id) or [(self.start_point, self.end_point)]
+
+    # CSR graphs carry no profile information
+    uses = None
+    loop_depth = 0
+
+    @property
+    def spilled(self):
+        return self._id in self._graph._spilled
+
+    @spilled.setter
+    def spilled(self, value):
+        if value:
+            self._graph._spilled.add(self._id)
+        else:
+            self._graph._spilled.discard(self._id)
+
+    @property
+    def register(self):
+        return self._graph._registers.get(self._id)
+
+    @register.setter
+    def register(self, value):
+        self._graph._registers[self._id] = value
+
+    @property
+    def interferences(self):
+        return frozenset(self._graph.neighbors(self.name))
+
+
+class CSRVariables(Mapping):
+    def __init__(self, graph):
+        self._graph = graph
+
+    def __getitem__(self, name):
+        return CSRVariable(self._graph, self._graph._ids[name])
+
+    def __iter__(self):
+        return iter(self._graph.names)
+
+    def __len__(self):
+        return len(self._graph.names)
+
+    def __contains__(self, name):
+        return name in self._graph._ids
+
+
+class CSRInterferenceGraph:
+    """
+    Interference graph over fixed CSR adjacency: the neighbors of node i are
+    indices[indptr[i]:indptr[i + 1]], sorted ascending. The arrays can be
+    NumPy arrays, array.array or memoryviews.
+
+    It offers the query interface GraphColoring and SpillHandler use. Edges
+    can be removed (as spilling does) but not added: removed edges and
+    detached nodes are tracked beside the arrays, which are never written.
+    `segments` optionally maps node ids to the segment lists of ranges with
+    lifetime holes; the adjacency must already respect them.
+    """
+    def __init__(self, names, starts, ends, indptr, indices, segments=None):
+        self.names = names
+        self.starts = starts
+        self.ends = ends
+        self.indptr = indptr
+        self.indices = indices
+        self._ids = {name: i for i, name in enumerate(names)}
+        self._degree = array("q", (int(indptr[i + 1] - indptr[i]) for i in range(len(names))))
+        self._edge_count = len(indices) // 2
+        self._removed_edges = set()  # (id, id) pairs, both orientations
+        self._detached = set()       # ids whose edges were all removed
+        self._spilled = set()
+        self._registers = {}
+        self._index = None
+        self._segments = segments or {}  # id -> segments, only for ranges with holes
+        self.variables = CSRVariables(self)
+
+    @property
+    def edges(self):
+        return EdgeView(self)
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = IntervalIndex()
+            for i, name in enumerate(self.names):
+                if i not in self._spilled:
+                    self._index.insert(name, int(self.starts[i]), int(self.ends[i]))
+        return self._index
+
+    def live_at(self, point):
+        return self.overlapping(point, point)
+
+    def overlapping(self, start_point, end_point):
+        names = self.index.overlap(start_point, end_point)
+        if not self._segments:
+            return names
+        # The index holds hulls; only ranges with holes need a closer look
+        query = [(start_point, end_point)]
+        return [name for name in names
+                if self._ids[name] not in self._segments
+                or segments_overlap(self._segments[self._ids[name]], query)]
+
+    def _row(self, var_id):
+        row = self.indices[self.indptr[var_id]:self.indptr[var_id + 1]]
+        return row.tolist() if hasattr(row, "tolist") else row
+
+    def _neighbor_ids(self, var_id):
+        if not self._removed_edges and not self._detached:
+            return self._row(var_id)
+        if var_id in self._detached:
+            return []
+        return [j for j in self._row(var_id)
+                if j not in self._detached and (var_id, j) not in self._removed_edges]
+
+    def neighbors(self, name):
+        names = self.names
+        return [names[j] for j in self._neighbor_ids(self._ids[name])]
+
+    def degree(self, name):
+        return self._degree[self._ids[name]]
+
+    def interferes(self, var1_name, var2_name):
+        id1 = self._ids.get(var1_name)
+        id2 = self._ids.get(var2_name)
+        if id1 is None or id2 is None or (id1, id2) in self._removed_edges:
+            return False
+        if id1 in self._detached or id2 in self._detached:
+            return False
+        lo, hi = self.indptr[id1], self.indptr[id1 + 1]
+        pos = bisect_left(self.indices, id2, lo, hi)
+        return pos < hi and self.indices[pos] == id2
+
+    def remove_interference(self, var1_name, var2_name):
+        if self.interferes(var1_name, var2_name):
+            id1 = self._ids[var1_name]
+            id2 = self._ids[var2_name]
+            self._removed_edges.add((id1, id2))
+            self._removed_edges.add((id2, id1))
+            self._degree[id1] -= 1
+            self._degree[id2] -= 1
+            self._edge_count -= 1
+
+    def detach_variables(self, names):
+        """Remove all edges of the given nodes by marking them detached"""
+        ids = {self._ids[name] for name in names} - self._detached
+        incident = 0
+        internal = 0
+        for var_id in ids:
+            for j in self._neighbor_ids(var_id):
+                if j in ids:
+                    internal += 1
+                else:
+                    self._degree[j] -= 1
+            incident += self._degree[var_id]
+        for var_id in ids:
+            self._degree[var_id] = 0
+        self._detached |= ids
+        removed = incident - internal // 2
+        self._edge_count -= removed
+        return removed
+
+    def edge_count(self):
+        return self._edge_count
+
+
+def build_csr(live_ranges, block_size=65536, use_numpy=None):
+    """
+    Build a CSRInterferenceGraph straight from live ranges, with the same
+    inclusive overlap rule as InterferenceGraph.build_from_live_ranges.
+    live_ranges: List of (variable_name, start_point, end_point)
+
+    With NumPy, ranges are sorted by start and each range's later partners
+    are found with one searchsorted call: they are exactly the ranges whose
+    start falls in [start, end]. Pairs are then generated `block_size` rows
+    at a time, so no n x n matrix is ever formed. Without NumPy (or with
+    use_numpy=False) a sweep line builds the same arrays.
+    """
+    if use_numpy is None:
+        use_numpy = np is not None
+    names = [live_range[0] for live_range in live_ranges]
+    if use_numpy:
+        if np is None:
+            raise ImportError("build_csr(use_numpy=True) requires NumPy")
+        return _build_csr_numpy(names, live_ranges, block_size)
+    return _build_csr_python(names, live_ranges)
+
+
+def _build_csr_numpy(names, live_ranges, block_size):
+    n = len(live_ranges)
+    starts = np.fromiter((live_range[1] for live_range in live_ranges), dtype=np.int64, count=n)
+    ends = np.fromiter((live_range[2] for live_range in live_ranges), dtype=np.int64, count=n)
+
+    order = np.argsort(starts, kind="stable")
+    sorted_starts = starts[order]
+    sorted_ends = ends[order]
+    # In start order, the partners of position i that come after it are
+    # positions i + 1 .. upper[i] - 1
+    upper = np.searchsorted(sorted_starts, sorted_ends, side="right")
+    counts = np.maximum(upper - np.arange(n) - 1, 0)
+
+    sources = []
+    targets = []
+    for lo in range(0, n, block_size):
+        hi = min(lo + block_size, n)
+        block_counts = counts[lo:hi]
+        total = int(block_counts.sum())
+        if total == 0:
+            continue
+        rows = np.repeat(np.arange(lo, hi), block_counts)
+        # Offset of each pair within its row: 0, 1, ..., count - 1
+        row_offsets = np.repeat(np.cumsum(block_counts) - block_counts, block_counts)
+        cols = rows + 1 + (np.arange(total) - row_offsets)
+        sources.append(order[rows])
+        targets.append(order[cols])
+
+    if sources:
+        u = np.concatenate(sources)
+        v = np.concatenate(targets)
+        rows = np.concatenate([u, v])
+        cols = np.concatenate([v, u])
+        perm = np.lexsort((cols, rows))
+        indices = cols[perm]
+        degrees = np.bincount(rows, minlength=n)
+    else:
+        indices = np.zeros(0, dtype=np.int64)
+        degrees = np.zeros(n, dtype=np.int64)
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(degrees, out=indptr[1:])
+    return CSRInterferenceGraph(names, starts, ends, indptr, indices)
+
+
+def _build_csr_python(names, live_ranges):
+    n = len(live_ranges)
+    adjacency = [[] for _ in range(n)]
+    active = []  # (end_point, id)
+    for var_id in sorted(range(n), key=lambda i: live_ranges[i][1]):
+        start, end = live_ranges[var_id][1:3]
+        while active and active[0][0] < start:
+            heapq.heappop(active)
+        for _, other in active:
+            adjacency[var_id].append(other)
+            adjacency[other].append(var_id)
+        heapq.heappush(active, (end, var_id))
+
+    indptr = array("q", [0])
+    indices = array("q")
+    for row in adjacency:
+        row.sort()
+        indices.extend(row)
+        indptr.append(len(indices))
+    starts = array("q", (live_range[1] for live_range in live_ranges))
+    ends = array("q", (live_range[2] for live_range in live_ranges))
+    return CSRInterferenceGraph(names, starts, ends, indptr, indices)
@@ -1,46 +1,113 @@
+import heapq
+
+from instrumentation import NULL_INSTRUMENTATION
+from spill_cost import estimate_spill_traffic, has_weights, spill_cost, spill_priority
+
+
 class GraphColoring:
-    def __init__(self, interference_graph, num_registers):
+    def __init__(self, interference_graph, num_registers, instrumentation=None):
         self.graph = interference_graph
         self.num_registers = num_registers
+        self.instrumentation = instrumentation or NULL_INSTRUMENTATION
         self.colors = {}  # variable_name -> color (register number)
+        self.spill_traffic = None  # estimated spill loads/stores of the last run
         
     def color_graph(self):
         """
         Implements graph coloring using Chaitin's algorithm
         Returns: (success, spill_candidates)
+
+        Simplify pops nodes off a worklist of low-degree nodes and keeps the
+        rest in degree buckets. Removing a node lowers its neighbors' degrees
+        in place, so the whole pass is O(V + E log D) for maximum degree D
+        (neighbors are visited in variable order to keep it deterministic).
+
+        Without profile data the spill choice is the highest-degree node. If
+        any variable carries uses/loop_depth, it is the lowest spill
+        cost/degree instead, kept in a lazily updated heap (O(E log V)).
         """
-        for var in self.graph.variables:
+        if self.graph.variables and len(self.colors) >= self.num_registers:
             # Ensure all nodes are either colored or marked for spilling
-            if len(self.colors) >= self.num_registers:
-                return False, [var for var in self.graph.variables if var not in self.colors]
+            return False, [var for var in self.graph.variables if var not in self.colors]
+
+        k = self.num_registers
+        order = {node: i for i, node in enumerate(self.graph.variables)}
+        degree = {}
+        simplify_worklist = []
+        buckets = {}  # degree -> {node: None} for nodes with degree >= k
+        max_degree = 0
+        for node, var in self.graph.variables.items():
+            if var.spilled:
+                # Already spilled (e.g. by live-range splitting); stays uncolored
+                continue
+            d = self.graph.degree(node)
+            degree[node] = d
+            if d < k:
+                simplify_worklist.append(node)
+            else:
+                buckets.setdefault(d, {})[node] = None
+                max_degree = max(max_degree, d)
+
+        spill_heap = None
+        if has_weights(self.graph.variables):
+            costs = {node: spill_cost(self.graph.variables[node]) for node in degree}
+            spill_heap = [(spill_priority(costs[node], d), seq, node, d)
+                          for seq, (node, d) in enumerate(degree.items()) if d >= k]
+            heapq.heapify(spill_heap)
+            seq = len(spill_heap)
+
         stack = []
-        remaining_nodes = set(self.graph.variables.keys())
+        removed = set()
         spill_candidates = set()
-        
+        remaining = remaining_at_start = len(degree)
+
         # Build stack of nodes
-        while remaining_nodes:
-            found_node = None
-            for node in remaining_nodes:
-                if len(self.graph.variables[node].interferences) < self.num_registers:
-                    found_node = node
-                    break
-                    
-            if found_node is None:
-                # Need to spill - choose highest degree node
-                spill_node = max(remaining_nodes, 
-                               key=lambda x: len(self.graph.variables[x].interferences))
-                spill_candidates.add(spill_node)
-                remaining_nodes.remove(spill_node)
+        while remaining:
+            if simplify_worklist:
+                node = simplify_worklist.pop()
+                stack.append(node)
+            elif spill_heap is not None:
+                # Need to spill - choose the cheapest node per interference,
+                # skipping heap entries made stale by degree changes
+                while True:
+                    _, _, node, d = heapq.heappop(spill_heap)
+                    if node not in removed and degree[node] == d and d >= k:
+                        break
+                del buckets[d][node]
+                spill_candidates.add(node)
             else:
-                stack.append(found_node)
-                remaining_nodes.remove(found_node)
-                
+                # Need to spill - choose highest degree node
+                while not buckets.get(max_degree):
+                    max_degree -= 1
+                node = next(iter(buckets[max_degree]))
+                del buckets[max_degree][node]
+                spill_candidates.add(node)
+
+            removed.add(node)
+            remaining -= 1
+            # Visit neighbors in variable order: the default backend keeps
+            # them in a set, whose order changes with the string hash seed
+            for neighbor in sorted((neighbor for neighbor in self.graph.neighbors(node)
+                                    if neighbor not in removed), key=order.__getitem__):
+                d = degree[neighbor]
+                degree[neighbor] = d - 1
+                if d >= k:
+                    del buckets[d][neighbor]
+                    if d == k:
+                        simplify_worklist.append(neighbor)
+                    else:
+                        buckets.setdefault(d - 1, {})[neighbor] = None
+                        if spill_heap is not None:
+                            heapq.heappush(spill_heap, (
+                                spill_priority(costs[neighbor], d - 1), seq, neighbor, d - 1))
+                            seq += 1
+
         # Assign colors
         success = True
         while stack and success:
             node = stack.pop()
             used_colors = set()
-            for neighbor in self.graph.variables[node].interferences:
+            for neighbor in self.graph.neighbors(node):
                 if neighbor in self.colors:
                     used_colors.add(self.colors[neighbor])
                     
@@ -49,5 +116,8 @@ class GraphColoring:
                 self.colors[node] = min(available_colors)
             else:
                 success = False
-                
+
+        self.spill_traffic = estimate_spill_traffic(self.graph.variables, spill_candidates)
+        self.instrumentation.count("simplify_iterations", remaining_at_start)
+        self.instrumentation.count("spill_candidates", len(spill_candidates))
         return success, spill_candidates
@@ -0,0 +1,206 @@
+# implicit_graph.py
+from bisect import bisect_left, bisect_right, insort
+
+from interference_graph import InterferenceGraph
+
+
+class ImplicitVariable:
+    __slots__ = ("name", "start_point", "end_point", "uses", "loop_depth",
+                 "spilled", "register", "_graph")
+
+    def __init__(self, graph, name, start_point, end_point, uses=None, loop_depth=0):
+        self._graph = graph
+        self.name = name
+        self.start_point = start_point
+        self.end_point = end_point
+        self.uses = uses
+        self.loop_depth = loop_depth
+        self.spilled = False
+        self.register = None
+
+    @property
+    def segments(self):
+        return [(self.start_point, self.end_point)]
+
+    @property
+    def interferences(self):
+        return frozenset(self._graph.neighbors(self.name))
+
+
+class ImplicitInterferenceGraph(InterferenceGraph):
+    """
+    Interference graph that stores no edges. Two attached (unspilled)
+    variables interfere exactly when their live ranges overlap, so:
+
+    - neighbors come from an interval query on the index;
+    - degree is (#starts <= end) - (#ends < start) - 1, by bisecting
+      sorted arrays of the attached variables' start and end points;
+    - interferes compares the two ranges.
+
+    Degrees are cached once computed and adjusted as neighbors come and
+    go. Memory is O(n) however dense the graph is.
+
+    Lifetime holes are filled: a range with segments counts as live over
+    its whole [start_point, end_point] hull, which is safe but keeps the
+    edges across the holes.
+
+    Edges removed with remove_interference are remembered per variable.
+    add_interference can only restore such an edge; any other edge exists
+    precisely when the ranges overlap, and is ignored otherwise.
+    """
+    def __init__(self):
+        super().__init__()
+        self._starts = []       # sorted start points of attached variables
+        self._ends = []         # sorted end points of attached variables
+        self._attached = set()  # names taking part in the graph
+        self._degree = {}       # name -> cached degree
+        self._removed = {}      # name -> names of explicitly removed neighbors
+
+    def build_from_live_ranges(self, live_ranges, method=None):
+        """
+        Build from live ranges; `method` is accepted for compatibility,
+        there are no edges to construct
+        """
+        if self.variables:
+            for var_name, start, end, *weights in live_ranges:
+                self.add_variable(var_name, start, end, *weights)
+            return
+        # Later duplicates replace earlier ones, as add_variable would
+        for var_name, start, end, *weights in live_ranges:
+            self.variables[var_name] = ImplicitVariable(self, var_name, start, end, *weights[:2])
+        for var_name, var in self.variables.items():
+            self.index.insert(var_name, var.start_point, var.end_point)
+            self._attached.add(var_name)
+            self._starts.append(var.start_point)
+            self._ends.append(var.end_point)
+        self._starts.sort()
+        self._ends.sort()
+        self._degree = {}
+        self._edge_count = sum(self._overlap_count(var.start_point, var.end_point) - 1
+                               for var in self.variables.values()) // 2
+
+    def add_variable(self, name, start_point, end_point, uses=None, loop_depth=0,
+                     segments=None):
+        if name in self.variables:
+            self.remove_variable(name)
+        var = ImplicitVariable(self, name, start_point, end_point, uses, loop_depth)
+        self.variables[name] = var
+        self._attach(name)
+        return var
+
+    def remove_variable(self, name):
+        self._detach(name)
+        del self.variables[name]
+        self.index.discard(name)
+
+    def update_range(self, name, start_point, end_point, segments=None):
+        var = self.variables[name]
+        if name not in self._attached:
+            var.start_point = start_point
+            var.end_point = end_point
+            return
+        removed = self._removed.get(name, set())
+        self._detach(name)
+        var.start_point = start_point
+        var.end_point = end_point
+        self._attach(name)
+        # Removed edges survive only while the ranges still overlap
+        for neighbor in removed:
+            self.remove_interference(name, neighbor)
+
+    def restore_variable(self, name):
+        self.variables[name].spilled = False
+        if name not in self._attached:
+            self._attach(name)
+
+    def _overlap_count(self, start_point, end_point):
+        """Number of attached ranges overlapping [start_point, end_point]"""
+        return bisect_right(self._starts, end_point) - bisect_left(self._ends, start_point)
+
+    def _attach(self, name):
+        var = self.variables[name]
+        insort(self._starts, var.start_point)
+        insort(self._ends, var.end_point)
+        self._attached.add(name)
+        self.index.insert(name, var.start_point, var.end_point)
+        degree = self._overlap_count(var.start_point, var.end_point) - 1
+        self._edge_count += degree
+        self._degree[name] = degree
+        for neighbor in self.neighbors(name):
+            if neighbor in self._degree:
+                self._degree[neighbor] += 1
+
+    def _detach(self, name):
+        if name not in self._attached:
+            return
+        var = self.variables[name]
+        # Count from the arrays rather than the cache: in a batch, other
+        # members may already have left the index but not the arrays
+        self._edge_count -= (self._overlap_count(var.start_point, var.end_point) - 1
+                             - len(self._removed.get(name, ())))
+        self.index.discard(name)
+        for neighbor in self.neighbors(name):
+            if neighbor in self._degree:
+                self._degree[neighbor] -= 1
+        for neighbor in self._removed.pop(name, ()):
+            self._removed[neighbor].discard(name)
+        del self._starts[bisect_left(self._starts, var.start_point)]
+        del self._ends[bisect_left(self._ends, var.end_point)]
+        self._attached.discard(name)
+        self._degree.pop(name, None)
+
+    def detach_variables(self, names):
+        edge_count = self._edge_count
+        for name in set(names):
+            self._detach(name)
+        return edge_count - self._edge_count
+
+    def add_interference(self, var1_name, var2_name):
+        removed = self._removed.get(var1_name)
+        if removed and var2_name in removed and self._overlaps(var1_name, var2_name):
+            removed.discard(var2_name)
+            self._removed[var2_name].discard(var1_name)
+            self._edge_count += 1
+            for name in (var1_name, var2_name):
+                if name in self._degree:
+                    self._degree[name] += 1
+
+    def remove_interference(self, var1_name, var2_name):
+        if self.interferes(var1_name, var2_name):
+            self._removed.setdefault(var1_name, set()).add(var2_name)
+            self._removed.setdefault(var2_name, set()).add(var1_name)
+            self._edge_count -= 1
+            for name in (var1_name, var2_name):
+                if name in self._degree:
+                    self._degree[name] -= 1
+
+    def _overlaps(self, var1_name, var2_name):
+        if (var1_name == var2_name or var1_name not in self._attached
+                or var2_name not in self._attached):
+            return False
+        var1 = self.variables[var1_name]
+        var2 = self.variables[var2_name]
+        return not (var1.end_point < var2.start_point or var2.end_point < var1.start_point)
+
+    def neighbors(self, name):
+        if name not in self._attached:
+            return []
+        var = self.variables[name]
+        removed = self._removed.get(name, ())
+        return [neighbor for neighbor in self.index.overlap(var.start_point, var.end_point)
+                if neighbor != name and neighbor not in removed]
+
+    def degree(self, name):
+        degree = self._degree.get(name)
+        if degree is None:
+            if name not in self._attached:
+                return 0
+            var = self.variables[name]
+            degree = (self._overlap_count(var.start_point, var.end_point) - 1
+                      - len(self._removed.get(name, ())))
+            self._degree[name] = degree
+        return degree
+
+    def interferes(self, var1_name, var2_name):
+        return (self._overlaps(var1_name, var2_name)
+                and var2_name not in self._removed.get(var1_name, ()))
@@ -0,0 +1,117 @@
+# instrumentation.py
+"""
+Phase timers and counters for the allocator.
+
+Components take an `instrumentation` argument and report through
+`phase(name)` (a context manager timed with perf_counter_ns) and
+`count(name, n)`. By default they get NULL_INSTRUMENTATION, whose methods do
+nothing; hot loops count into locals and report once per pass, so leaving
+the hooks in costs a few no-op calls per allocation.
+
+    instrumentation = Instrumentation(sinks=[print_event])
+    allocator = RegisterAllocator(8, instrumentation=instrumentation)
+    ...
+    instrumentation.stats.as_dict()
+"""
+import time
+
+
+class AllocationStats:
+    """Accumulated phase timings (nanoseconds) and counters"""
+    def __init__(self):
+        self.phase_ns = {}     # phase name -> total nanoseconds
+        self.phase_calls = {}  # phase name -> times entered
+        self.counters = {}     # counter name -> total
+
+    def __getitem__(self, name):
+        return self.counters.get(name, 0)
+
+    def as_dict(self):
+        return {
+            "phase_ns": dict(self.phase_ns),
+            "phase_calls": dict(self.phase_calls),
+            "counters": dict(self.counters),
+        }
+
+
+class _Phase:
+    __slots__ = ("_instrumentation", "_name", "_start")
+
+    def __init__(self, instrumentation, name):
+        self._instrumentation = instrumentation
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._instrumentation._record_phase(self._name, time.perf_counter_ns() - self._start)
+        return False
+
+
+class Instrumentation:
+    """
+    Collects an AllocationStats and forwards every event to the registered
+    sinks, called as sink(kind, name, value) with kind "phase" (value in
+    nanoseconds) or "count".
+    """
+    enabled = True
+
+    def __init__(self, sinks=()):
+        self.stats = AllocationStats()
+        self._sinks = list(sinks)
+
+    def add_sink(self, sink):
+        self._sinks.append(sink)
+
+    def reset(self):
+        self.stats = AllocationStats()
+
+    def phase(self, name):
+        return _Phase(self, name)
+
+    def count(self, name, n=1):
+        counters = self.stats.counters
+        counters[name] = counters.get(name, 0) + n
+        for sink in self._sinks:
+            sink("count", name, n)
+
+    def _record_phase(self, name, elapsed_ns):
+        stats = self.stats
+        stats.phase_ns[name] = stats.phase_ns.get(name, 0) + elapsed_ns
+        stats.phase_calls[name] = stats.phase_calls.get(name, 0) + 1
+        for sink in self._sinks:
+            sink("phase", name, elapsed_ns)
+
+
+class _NullPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+class NullInstrumentation:
+    """Instrumentation that records nothing"""
+    enabled = False
+    stats = None
+    _phase = _NullPhase()
+
+    def add_sink(self, sink):
+        raise ValueError("cannot add a sink to NULL_INSTRUMENTATION")
+
+    def reset(self):
+        pass
+
+    def phase(self, name):
+        return self._phase
+
+    def count(self, name, n=1):
+        pass
+
+
+NULL_INSTRUMENTATION = NullInstrumentation()
@@ -1,49 +1,323 @@
 # interference_graph.py
+import heapq
+from collections.abc import Set
+
+from interval_index import IntervalIndex
+
+
+def normalize_segments(segments):
+    """
+    Sorted list of disjoint (start, end) segments covering the same points
+    as `segments`; overlapping and adjacent segments are merged.
+    """
+    merged = []
+    for start, end in sorted(segments):
+        if start > end:
+            raise ValueError(f"Empty live-range segment: ({start}, {end})")
+        if merged and start <= merged[-1][1] + 1:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    if not merged:
+        raise ValueError("A live range needs at least one segment")
+    return merged
+
+
+def segments_overlap(segments1, segments2, strict=False):
+    """
+    True if two sorted segment lists share a point, found by merging them
+    in O(len(segments1) + len(segments2)). With strict, segments that only
+    touch at an end point do not count.
+    """
+    i = j = 0
+    while i < len(segments1) and j < len(segments2):
+        start1, end1 = segments1[i]
+        start2, end2 = segments2[j]
+        if strict:
+            if start1 < end2 and start2 < end1:
+                return True
+        elif start1 <= end2 and start2 <= end1:
+            return True
+        # Drop whichever segment ends first; it cannot meet any later one
+        if end1 < end2:
+            i += 1
+        else:
+            j += 1
+    return False
+
+
+def intersect_segments(segments1, segments2):
+    """Segments where both sorted segment lists are live, by merging them"""
+    result = []
+    i = j = 0
+    while i < len(segments1) and j < len(segments2):
+        start1, end1 = segments1[i]
+        start2, end2 = segments2[j]
+        start = max(start1, start2)
+        end = min(end1, end2)
+        if start <= end:
+            result.append((start, end))
+        if end1 < end2:
+            i += 1
+        else:
+            j += 1
+    return result
+
+
+def clip_segments(segments, start_point, end_point):
+    """The parts of `segments` inside [start_point, end_point]"""
+    return [(max(start, start_point), min(end, end_point))
+            for start, end in segments if start <= end_point and end >= start_point]
+
+
 class Variable:
-    def __init__(self, name, start_point, end_point):
+    __slots__ = ("name", "start_point", "end_point", "uses", "loop_depth",
+                 "spilled", "register", "interferences", "segments")
+
+    def __init__(self, name, start_point, end_point, uses=None, loop_depth=0, segments=None):
         self.name = name
         self.start_point = start_point
         self.end_point = end_point
+        self.uses = uses              # number of reads, None if unknown
+        self.loop_depth = loop_depth  # loop nesting depth of the range
         self.spilled = False
         self.register = None
         self.interferences = set()
+        # Sorted (start, end) segments where the value is live; the gaps
+        # between them are lifetime holes
+        self.segments = segments or [(start_point, end_point)]
+
+
+class EdgeView(Set):
+    """
+    Read-only view of a graph's edges as (var1, var2) tuples in both
+    orientations, derived from the adjacency on demand instead of stored.
+    """
+    def __init__(self, graph):
+        self._graph = graph
+
+    def __contains__(self, edge):
+        try:
+            var1_name, var2_name = edge
+        except (TypeError, ValueError):
+            return False
+        return self._graph.interferes(var1_name, var2_name)
+
+    def __iter__(self):
+        for name in list(self._graph.variables):
+            for neighbor in self._graph.neighbors(name):
+                yield (name, neighbor)
+
+    def __len__(self):
+        return 2 * self._graph.edge_count()
+
+
+def check_segments(start_point, end_point, segments):
+    """Normalized `segments`, which must span exactly [start_point, end_point]"""
+    segments = normalize_segments(segments)
+    if segments[0][0] != start_point or segments[-1][1] != end_point:
+        raise ValueError(f"Segments {segments} do not span [{start_point}, {end_point}]")
+    return segments
+
 
 class InterferenceGraph:
+    """
+    Name-keyed interference graph. GraphColoring, SpillHandler,
+    CoalesceHandler and LiveRangeSplitter only go through `variables` and
+    the query/update methods below, so any backend providing them (see
+    compact_graph.CompactInterferenceGraph) can be used in its place.
+
+    A live range may have lifetime holes: `segments` lists the disjoint
+    [start, end] pieces where the value is live, and start_point/end_point
+    are its hull. Two variables interfere only if their segments overlap,
+    so a value dead across a loop body or branch leaves that gap free.
+    """
     def __init__(self):
         self.variables = {}  # name -> Variable
-        self.edges = set()   # set of (var1, var2) tuples
-        
-    def add_variable(self, name, start_point, end_point):
-        var = Variable(name, start_point, end_point)
+        self.index = IntervalIndex()  # live ranges of unspilled variables
+        self._edge_count = 0
+
+    @property
+    def edges(self):
+        return EdgeView(self)
+
+    def add_variable(self, name, start_point, end_point, uses=None, loop_depth=0,
+                     segments=None):
+        """
+        Add a variable live over [start_point, end_point], or only over
+        `segments` within it if given (a list of (start, end) pairs)
+        """
+        if segments is not None:
+            segments = check_segments(start_point, end_point, segments)
+        if name in self.variables:
+            self.remove_variable(name)
+        var = Variable(name, start_point, end_point, uses, loop_depth, segments)
         self.variables[name] = var
+        self.index.insert(name, start_point, end_point)
         return var
-        
+
+    def update_range(self, name, start_point, end_point, segments=None):
+        """Change a variable's live range; interferences are left to the caller"""
+        var = self.variables[name]
+        if segments is not None:
+            segments = check_segments(start_point, end_point, segments)
+        var.segments = segments or [(start_point, end_point)]
+        var.start_point = start_point
+        var.end_point = end_point
+        if name in self.index:
+            self.index.update(name, start_point, end_point)
+
+    def live_at(self, point):
+        """Names of unspilled variables live at `point`"""
+        return self.overlapping(point, point)
+
+    def overlapping(self, start_point, end_point):
+        """Names of unspilled variables live anywhere in [start_point, end_point]"""
+        # The index holds hulls; only ranges with holes need a closer look
+        variables = self.variables
+        query = [(start_point, end_point)]
+        return [name for name in self.index.overlap(start_point, end_point)
+                if len(variables[name].segments) == 1
+                or segments_overlap(variables[name].segments, query)]
+
+    def remove_variable(self, name):
+        var = self.variables.pop(name)
+        self.index.discard(name)
+        for neighbor in var.interferences:
+            self.variables[neighbor].interferences.discard(name)
+        self._edge_count -= len(var.interferences)
+        var.interferences = set()
+
+    def detach_variables(self, names):
+        """
+        Remove every interference of the given variables in one pass over
+        their adjacency, including edges between two of them.
+        Returns: number of edges removed
+        """
+        batch = set(names)
+        variables = self.variables
+        incident = 0
+        internal = 0  # edges inside the batch, seen from both ends
+        for name in batch:
+            var = variables[name]
+            for neighbor in var.interferences:
+                if neighbor in batch:
+                    internal += 1
+                else:
+                    variables[neighbor].interferences.discard(name)
+            incident += len(var.interferences)
+            var.interferences = set()
+        removed = incident - internal // 2
+        self._edge_count -= removed
+        return removed
+
+    def restore_variable(self, name):
+        """Undo a spill: put name back in the index and recompute its edges"""
+        var = self.variables[name]
+        var.spilled = False
+        self.index.insert(name, var.start_point, var.end_point)
+        self.refresh_interferences(name)
+
+    def refresh_interferences(self, name):
+        """
+        Recompute one variable's edges from the interval index after its
+        range changed: stale edges are dropped and new overlaps added, in
+        O(degree + k + log n) per segment for k overlapping ranges
+        """
+        current = set()
+        for start, end in self.variables[name].segments:
+            current.update(self.overlapping(start, end))
+        current.discard(name)
+        for neighbor in list(self.neighbors(name)):
+            if neighbor not in current:
+                self.remove_interference(name, neighbor)
+        for neighbor in current:
+            self.add_interference(name, neighbor)
+
     def add_interference(self, var1_name, var2_name):
         if var1_name not in self.variables or var2_name not in self.variables:
             return
-        
+        if var1_name == var2_name:
+            return
+
         var1 = self.variables[var1_name]
         var2 = self.variables[var2_name]
-        
-        if (var1.name, var2.name) not in self.edges:
-            self.edges.add((var1.name, var2.name))
-            self.edges.add((var2.name, var1.name))
-            var1.interferences.add(var2.name)
-            var2.interferences.add(var1.name)
-            
-    def build_from_live_ranges(self, live_ranges):
+
+        if var2_name not in var1.interferences:
+            var1.interferences.add(var2_name)
+            var2.interferences.add(var1_name)
+            self._edge_count += 1
+
+    def remove_interference(self, var1_name, var2_name):
+        var1 = self.variables[var1_name]
+        if var2_name in var1.interferences:
+            var1.interferences.remove(var2_name)
+            self.variables[var2_name].interferences.remove(var1_name)
+            self._edge_count -= 1
+
+    def neighbors(self, name):
+        return self.variables[name].interferences
+
+    def degree(self, name):
+        return len(self.variables[name].interferences)
+
+    def interferes(self, var1_name, var2_name):
+        var1 = self.variables.get(var1_name)
+        return var1 is not None and var2_name in var1.interferences
+
+    def edge_count(self):
+        return self._edge_count
+
+    def build_from_live_ranges(self, live_ranges, method="sweep"):
         """
         Build interference graph from live ranges
-        live_ranges: List of (variable_name, start_point, end_point)
+        live_ranges: List of (variable_name, start_point, end_point), each
+                     optionally followed by a use count, a loop depth and a
+                     list of (start, end) segments with lifetime holes
+        method: "sweep" (default) or "pairwise" (quadratic reference builder)
         """
         # First add all variables
-        for var_name, start, end in live_ranges:
-            self.add_variable(var_name, start, end)
-            
+        for var_name, start, end, *weights in live_ranges:
+            self.add_variable(var_name, start, end, *weights)
+
         # Then add interferences
-        for var1_name, start1, end1 in live_ranges:
-            for var2_name, start2, end2 in live_ranges:
+        if method == "sweep":
+            self._build_sweep(live_ranges)
+        elif method == "pairwise":
+            self._build_pairwise(live_ranges)
+        else:
+            raise ValueError(f"Unknown build method: {method}")
+
+    def _build_pairwise(self, live_ranges):
+        variables = self.variables
+        for var1_name, *_ in live_ranges:
+            for var2_name, *_ in live_ranges:
                 if var1_name != var2_name:
                     # Check if ranges overlap
-                    if not (end1 < start2 or end2 < start1):
+                    if segments_overlap(variables[var1_name].segments,
+                                        variables[var2_name].segments):
                         self.add_interference(var1_name, var2_name)
+
+    def _build_sweep(self, live_ranges):
+        """
+        Sweep the segments in start order, keeping the segments that are
+        still live in a min-heap keyed by end point. A segment overlaps
+        exactly the segments left in the heap when it starts, so the whole
+        build costs O(s log s + E) for s segments. Holes never enter the
+        heap, so no edge is created across them.
+        """
+        variables = self.variables
+        names = dict.fromkeys(live_range[0] for live_range in live_ranges)
+        segments = sorted(((start, end, name) for name in names
+                           for start, end in variables[name].segments),
+                          key=lambda segment: segment[0])
+        active = []  # (end_point, variable_name)
+        for start, end, var_name in segments:
+            # Endpoints are inclusive: a segment ending at `start` still overlaps
+            while active and active[0][0] < start:
+                heapq.heappop(active)
+            for _, other in active:
+                if other != var_name:
+                    self.add_interference(var_name, other)
+            heapq.heappush(active, (end, var_name))
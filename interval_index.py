@@ -0,0 +1,177 @@
+# interval_index.py
+import random
+
+
+class _Node:
+    __slots__ = ("key", "name", "end", "max_end", "priority", "left", "right")
+
+    def __init__(self, key, name, end, priority):
+        self.key = key          # (start_point, insertion sequence)
+        self.name = name
+        self.end = end
+        self.max_end = end      # largest end point in this subtree
+        self.priority = priority
+        self.left = None
+        self.right = None
+
+
+def _update(node):
+    max_end = node.end
+    if node.left is not None and node.left.max_end > max_end:
+        max_end = node.left.max_end
+    if node.right is not None and node.right.max_end > max_end:
+        max_end = node.right.max_end
+    node.max_end = max_end
+
+
+def _split(node, key):
+    """Split a treap into (keys < key, keys >= key)"""
+    if node is None:
+        return None, None
+    if node.key < key:
+        left, right = _split(node.right, key)
+        node.right = left
+        _update(node)
+        return node, right
+    left, right = _split(node.left, key)
+    node.left = right
+    _update(node)
+    return left, node
+
+
+def _merge(left, right):
+    """Merge two treaps where every key in `left` is below every key in `right`"""
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        _update(left)
+        return left
+    right.left = _merge(left, right.left)
+    _update(right)
+    return right
+
+
+def _build(entries, rng):
+    """
+    Build a treap from (key, name, end) entries sorted by key in O(n), as a
+    Cartesian tree over random priorities.
+    """
+    spine = []
+    for key, name, end in entries:
+        node = _Node(key, name, end, rng.random())
+        last = None
+        while spine and spine[-1].priority < node.priority:
+            last = spine.pop()
+        node.left = last
+        if spine:
+            spine[-1].right = node
+        spine.append(node)
+    if not spine:
+        return None
+    root = spine[0]
+
+    # Fill in max_end bottom-up
+    order = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        order.append(node)
+        if node.left is not None:
+            stack.append(node.left)
+        if node.right is not None:
+            stack.append(node.right)
+    for node in reversed(order):
+        _update(node)
+    return root
+
+
+def _remove(node, key):
+    if node.key == key:
+        return _merge(node.left, node.right)
+    if key < node.key:
+        node.left = _remove(node.left, key)
+    else:
+        node.right = _remove(node.right, key)
+    _update(node)
+    return node
+
+
+class IntervalIndex:
+    """
+    Dynamic index of named closed intervals [start, end], stored as a treap
+    ordered by start point and augmented with each subtree's largest end
+    point. Insert, remove and update take O(log n) expected time; stabbing
+    and overlap queries take O(log n + k) for k results.
+
+    Inserts are buffered until the next removal or query; a buffer that
+    lands in an empty index is built in one O(n log n) pass, so filling the
+    index for a whole function costs little more than a sort.
+    """
+    def __init__(self):
+        self._root = None
+        self._keys = {}  # name -> key of its node
+        self._pending = []  # buffered (key, name, end) inserts
+        self._seq = 0
+        self._random = random.Random(0)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, name):
+        return name in self._keys
+
+    def insert(self, name, start, end):
+        if name in self._keys:
+            self.remove(name)
+        key = (start, self._seq)
+        self._seq += 1
+        self._keys[name] = key
+        self._pending.append((key, name, end))
+
+    def _flush(self):
+        if not self._pending:
+            return
+        pending = self._pending
+        self._pending = []
+        if self._root is None:
+            pending.sort(key=lambda entry: entry[0])
+            self._root = _build(pending, self._random)
+            return
+        for key, name, end in pending:
+            node = _Node(key, name, end, self._random.random())
+            left, right = _split(self._root, key)
+            self._root = _merge(_merge(left, node), right)
+
+    def remove(self, name):
+        self._flush()
+        self._root = _remove(self._root, self._keys.pop(name))
+
+    def discard(self, name):
+        if name in self._keys:
+            self.remove(name)
+
+    def update(self, name, start, end):
+        self.insert(name, start, end)
+
+    def overlap(self, start, end):
+        """Names of intervals sharing at least one point with [start, end]"""
+        self._flush()
+        result = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            if node is None or node.max_end < start:
+                continue
+            stack.append(node.left)
+            if node.key[0] <= end:
+                if node.end >= start:
+                    result.append(node.name)
+                stack.append(node.right)
+        return result
+
+    def stab(self, point):
+        """Names of intervals containing `point`"""
+        return self.overlap(point, point)
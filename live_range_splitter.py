@@ -1,6 +1,16 @@
+import heapq
+from bisect import bisect_left, bisect_right
+
+from instrumentation import NULL_INSTRUMENTATION
+from interference_graph import clip_segments, segments_overlap
+from pressure import pressure_profile
+from spill_cost import DEFAULT_USES, execution_weight, spill_cost
+
+
 class LiveRangeSplitter:
-    def __init__(self, interference_graph):
+    def __init__(self, interference_graph, instrumentation=None):
         self.graph = interference_graph
+        self.instrumentation = instrumentation or NULL_INSTRUMENTATION
         
     def split_range(self, var_name, split_point):
         """
@@ -15,18 +25,214 @@ class LiveRangeSplitter:
             return None, False
             
         # Create new variable for second part of range
-        new_var_name = f"{var_name}_split_{split_point}"
-        self.graph.add_variable(new_var_name, split_point, var.end_point)
+        new_var_name = self._add_piece(var, split_point)
         
         # Update original variable's range
-        var.end_point = split_point
+        end_point = var.end_point
+        self._shorten(var_name, split_point)
         
         # Copy interferences that overlap with new range
-        new_var = self.graph.variables[new_var_name]
-        for interfering_var_name in var.interferences:
+        new_segments = self.graph.variables[new_var_name].segments
+        for interfering_var_name in self.graph.overlapping(split_point, end_point):
+            if interfering_var_name in (var_name, new_var_name):
+                continue
             interfering_var = self.graph.variables[interfering_var_name]
-            if interfering_var.start_point < new_var.end_point and \
-               interfering_var.end_point > new_var.start_point:
+            if segments_overlap(interfering_var.segments, new_segments, strict=True):
                 self.graph.add_interference(new_var_name, interfering_var_name)
                 
+        self.instrumentation.count("splits")
         return new_var_name, True
+
+    def split_for_pressure(self, num_registers):
+        """
+        Split live ranges so that at most num_registers variables are live
+        at every point, spilling only the parts of a range that lie in
+        high-pressure regions instead of the whole range.
+
+        Belady's rule (on overflow, drop the value that stays live
+        furthest) picks the ranges that must give up their register, as
+        linear scan would. Then, most expensive first, each one takes back
+        the points where pressure is still below num_registers: it is cut
+        at the boundaries and only the pieces in between are spilled,
+        unless they would cost as much as spilling the whole range. Pieces
+        do not overlap: the value moves between them at the cut. Pressure
+        is counted per segment, so lifetime holes are never spilled.
+
+        Afterwards `spills_avoided` is the number of such ranges that kept
+        a register for at least part of their lifetime.
+        Returns: (pieces, spill_candidates) where pieces maps each split
+        variable to its piece names in program order
+        """
+        graph = self.graph
+        live_ranges = [(name, start, end)
+                       for name, var in graph.variables.items() if not var.spilled
+                       for start, end in var.segments]
+        pieces = {}
+        spill_candidates = set()
+        self.spills_avoided = 0
+        if pressure_profile(live_ranges).fits(num_registers):
+            return pieces, spill_candidates
+
+        victims = set(_belady_victims(live_ranges, num_registers))
+        kept = pressure_profile(live_range for live_range in live_ranges
+                                if live_range[0] not in victims)
+        points, pressures = kept.points, kept.pressures
+
+        splits = 0
+        for name in sorted(victims, key=lambda name: (-spill_cost(graph.variables[name]), name)):
+            var = graph.variables[name]
+            blocked = [(segment, _blocked_spans(points, pressures, *segment, num_registers))
+                       for segment in var.segments]
+            spans = [span for _, segment_spans in blocked for span in segment_spans]
+            if spans and self.pieces_cost(var, spans) >= spill_cost(var):
+                spill_candidates.add(name)
+                continue
+
+            self.spills_avoided += 1
+            for (segment_start, segment_end), segment_spans in blocked:
+                free_start = segment_start
+                for span_start, span_end in segment_spans + [(segment_end + 1, None)]:
+                    if free_start < span_start:
+                        _add_pressure(points, pressures, free_start, span_start - 1)
+                    free_start = span_end + 1 if span_end is not None else None
+
+            chain, inside = self.split_around(name, spans)
+            spill_candidates.update(inside)
+            if len(chain) > 1:
+                pieces[name] = chain
+                splits += len(chain) - 1
+
+        self.instrumentation.count("splits", splits)
+        self.instrumentation.count("spills_avoided", self.spills_avoided)
+        return pieces, spill_candidates
+
+    def split_around(self, var_name, spans):
+        """
+        Cut var_name at the boundaries of `spans`, sorted disjoint
+        [start, end] stretches lying within its segments.
+        Returns: (chain, inside) where chain lists every piece in program
+        order, starting with var_name, and inside the pieces covering spans
+        """
+        graph = self.graph
+        chain = [var_name]
+        inside = []
+        current = var_name
+        for span_start, span_end in spans:
+            if graph.variables[current].start_point < span_start:
+                current = self._cut(current, span_start, var_name)
+                chain.append(current)
+            inside.append(current)
+            if graph.variables[current].end_point > span_end:
+                current = self._cut(current, span_end + 1, var_name)
+                chain.append(current)
+        return chain, inside
+
+    @staticmethod
+    def pieces_cost(var, spans):
+        """Estimated spill cost of the pieces of var covering `spans`"""
+        length = var.end_point - var.start_point + 1
+        cost = 0
+        for span_start, span_end in spans:
+            uses = DEFAULT_USES
+            if var.uses is not None:
+                uses = max(1, var.uses * (span_end - span_start + 1) // length)
+            cost += (uses + 1) * execution_weight(var)
+        return cost
+
+    def _cut(self, var_name, point, base):
+        """
+        Shorten var_name to end at point - 1 and give [point, end] to a new
+        variable. Only the new piece's overlapping ranges are examined.
+        """
+        var = self.graph.variables[var_name]
+        piece_name = self._add_piece(var, point, base)
+        self._shorten(var_name, point - 1)
+        for start, end in self.graph.variables[piece_name].segments:
+            for other in self.graph.overlapping(start, end):
+                if other != piece_name:
+                    self.graph.add_interference(piece_name, other)
+        return piece_name
+
+    def _add_piece(self, var, start_point, base=None):
+        """New variable covering the segments of var in [start_point, var.end_point]"""
+        uses = var.uses
+        if uses is not None:
+            # Apportion the reads by length; each piece keeps at least one
+            length = var.end_point - var.start_point + 1
+            piece_uses = max(1, uses * (var.end_point - start_point + 1) // length)
+            var.uses = max(1, uses - piece_uses)
+            uses = piece_uses
+        piece_name = f"{base or var.name}_split_{start_point}"
+        segments = clip_segments(var.segments, start_point, var.end_point)
+        self.graph.add_variable(piece_name, segments[0][0], var.end_point, uses, var.loop_depth,
+                                segments)
+        return piece_name
+
+    def _shorten(self, var_name, end_point):
+        """Move var_name's end back and drop edges it no longer needs"""
+        graph = self.graph
+        var = graph.variables[var_name]
+        segments = clip_segments(var.segments, var.start_point, end_point)
+        graph.update_range(var_name, var.start_point, segments[-1][1], segments)
+        for other in list(graph.neighbors(var_name)):
+            if not segments_overlap(graph.variables[other].segments, segments):
+                graph.remove_interference(var_name, other)
+
+
+def _belady_victims(live_ranges, num_registers):
+    """
+    Names of the ranges to drop so that at most num_registers are live at
+    any point. Dropping the one live furthest ahead at each overflow needs
+    the fewest drops for intervals.
+    """
+    active = []    # (end, name)
+    furthest = []  # (-end, name), lazily pruned
+    live = set()
+    for name, start, end in sorted(live_ranges, key=lambda live_range: live_range[1:]):
+        while active and active[0][0] < start:
+            live.discard(heapq.heappop(active)[1])
+        heapq.heappush(active, (end, name))
+        heapq.heappush(furthest, (-end, name))
+        live.add(name)
+        if len(live) > num_registers:
+            while furthest[0][1] not in live:
+                heapq.heappop(furthest)
+            victim = heapq.heappop(furthest)[1]
+            live.remove(victim)
+            yield victim
+
+
+def _blocked_spans(points, pressures, start, end, limit):
+    """Maximal [start, end] stretches of [start, end] where pressure >= limit"""
+    spans = []
+    i = bisect_right(points, start) - 1
+    point = start
+    while point <= end:
+        pressure = pressures[i] if i >= 0 else 0
+        next_point = points[i + 1] if i + 1 < len(points) else end + 1
+        segment_end = min(end, next_point - 1)
+        if pressure >= limit:
+            if spans and spans[-1][1] == point - 1:
+                spans[-1] = (spans[-1][0], segment_end)
+            else:
+                spans.append((point, segment_end))
+        point = segment_end + 1
+        i += 1
+    return spans
+
+
+def _breakpoint(points, pressures, point):
+    """Index of `point` in the step function, inserting it if needed"""
+    i = bisect_left(points, point)
+    if i == len(points) or points[i] != point:
+        points.insert(i, point)
+        pressures.insert(i, pressures[i - 1] if i else 0)
+    return i
+
+
+def _add_pressure(points, pressures, start, end):
+    """Raise the pressure over [start, end] by one"""
+    i = _breakpoint(points, pressures, start)
+    j = _breakpoint(points, pressures, end + 1)
+    for k in range(i, j):
+        pressures[k] += 1
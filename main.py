@@ -1,24 +1,98 @@
-from interference_graph import InterferenceGraph
+import heapq
+from types import MappingProxyType
+
+from interference_graph import (InterferenceGraph, intersect_segments, normalize_segments,
+                                segments_overlap)
+from interval_index import IntervalIndex
+from verifier import verify_allocation
+from compact_graph import CompactInterferenceGraph
+from implicit_graph import ImplicitInterferenceGraph
 from graph_coloring import GraphColoring
+from components import color_components
 from spill_handler import SpillHandler
 from coalesce_handler import CoalesceHandler
 from live_range_splitter import LiveRangeSplitter
+from spill_cost import (estimate_spill_traffic, has_weights, spill_cost, spill_loads,
+                        spill_priority, spill_stores)
+from instrumentation import NULL_INSTRUMENTATION
+
+GRAPH_BACKENDS = {
+    "default": InterferenceGraph,
+    "compact": CompactInterferenceGraph,
+    "implicit": ImplicitInterferenceGraph,
+}
+
+ALLOCATION_MODES = ("timeline", "linear_scan", "coloring", "greedy")
+
+# Times a range may lose its register in greedy mode before it keeps it
+GREEDY_MAX_EVICTIONS = 4
 
 class RegisterAllocator:
-    def __init__(self, num_registers):
+    def __init__(self, num_registers, backend="default", mode="timeline",
+                 instrumentation=None, auto_split=False, decompose=False, max_workers=0,
+                 verify=False):
+        if backend not in GRAPH_BACKENDS:
+            raise ValueError(f"Unknown graph backend: {backend}")
+        if mode not in ALLOCATION_MODES:
+            raise ValueError(f"Unknown allocation mode: {mode}")
         self.num_registers = num_registers
-        self.interference_graph = InterferenceGraph()
+        self.backend = backend
+        self.mode = mode
+        self.instrumentation = instrumentation or NULL_INSTRUMENTATION
+        self.interference_graph = GRAPH_BACKENDS[backend]()
         self.graph_coloring = None
         self.spill_handler = None
         self.coalesce_handler = None
         self.live_range_splitter = None
+        self.spill_traffic = None  # estimated spill loads/stores of the last allocation
+        self.spill_slots = {}      # spilled variable -> stack slot of the last allocation
+        # Split long ranges around high-pressure regions before allocating
+        self.auto_split = auto_split
+        self.split_pieces = {}  # original name -> piece names, after auto_split
+        self.spills_avoided = 0
+        # In coloring mode, color each connected component separately, in a
+        # pool of max_workers processes unless it is 0 (see components.py)
+        self.decompose = decompose
+        self.max_workers = max_workers
+        # Check every result with verifier.verify_allocation, raising
+        # ValueError on a conflict; `verification` holds the last report
+        self.verify = verify
+        self.verification = None
+        self.live_ranges = {}   # name -> live range tuple, kept current by reallocate
+        # Result of the last allocate_registers/reallocate; one dict for the
+        # allocator's lifetime, exposed read-only through `allocation`
+        self._allocation = {}
+        self._allocation_view = MappingProxyType(self._allocation)
+        self._allocated = False
+        self._spilled_index = None  # hulls of spilled variables, built by reallocate
+
+    @property
+    def allocation(self):
+        """
+        Read-only live view of the current allocation (None before
+        allocate_registers); later calls update it in place, so copy it
+        with dict() to keep a snapshot
+        """
+        return self._allocation_view if self._allocated else None
+
+    @property
+    def stats(self):
+        """AllocationStats collected so far, or None without instrumentation"""
+        return self.instrumentation.stats
 
     def initialize(self, live_ranges):
-        self.interference_graph.build_from_live_ranges(live_ranges)
-        self.graph_coloring = GraphColoring(self.interference_graph, self.num_registers)
-        self.spill_handler = SpillHandler(self.interference_graph)
-        self.coalesce_handler = CoalesceHandler(self.interference_graph)
-        self.live_range_splitter = LiveRangeSplitter(self.interference_graph)
+        live_ranges = list(live_ranges)
+        self.live_ranges = {live_range[0]: tuple(live_range) for live_range in live_ranges}
+        instrumentation = self.instrumentation
+        with instrumentation.phase("build"):
+            self.interference_graph.build_from_live_ranges(live_ranges)
+        instrumentation.count("nodes", len(self.interference_graph.variables))
+        instrumentation.count("edges", self.interference_graph.edge_count())
+        self.graph_coloring = GraphColoring(self.interference_graph, self.num_registers,
+                                            instrumentation)
+        self.spill_handler = SpillHandler(self.interference_graph, instrumentation)
+        self.coalesce_handler = CoalesceHandler(self.interference_graph, instrumentation)
+        self.live_range_splitter = LiveRangeSplitter(self.interference_graph, instrumentation)
 
     def get_next_available_register(self, current_time, register_usage, used_registers):
         """
@@ -36,6 +110,425 @@ class RegisterAllocator:
         return None
 
     def allocate_registers(self):
+        """
+        Allocate registers with the configured mode.
+        Returns a dictionary of variable_name -> register_number or 'spilled'
+
+        Afterwards `spill_traffic` holds the estimated dynamic spill loads
+        and stores of the result (see spill_cost.py) and `spill_slots` the
+        stack slot of each spilled variable.
+
+        With auto_split, long ranges are first split around the regions
+        where pressure exceeds the register count and only the pieces inside
+        them are spilled. The result then names the pieces, and
+        `spills_avoided` counts ranges that would have been spilled whole
+        but kept a register for at least part of their lifetime.
+        """
+        if self.auto_split:
+            with self.instrumentation.phase("split"):
+                self.split_pieces, spill_candidates = \
+                    self.live_range_splitter.split_for_pressure(self.num_registers)
+            with self.instrumentation.phase("spill"):
+                self.spill_handler.handle_spills(spill_candidates)
+        if self.mode == "linear_scan":
+            with self.instrumentation.phase("linear_scan"):
+                allocation = self._allocate_linear_scan()
+        elif self.mode == "coloring":
+            allocation = self._allocate_coloring()
+        elif self.mode == "greedy":
+            with self.instrumentation.phase("greedy"):
+                allocation = self._allocate_greedy()
+        else:
+            allocation = self._allocate_timeline()
+        spilled = [var_name for var_name, reg in allocation.items() if reg == 'spilled']
+        self.spill_traffic = estimate_spill_traffic(self.interference_graph.variables, spilled)
+        self.spill_slots = self.spill_handler.assign_spill_slots(spilled)
+        if self.auto_split:
+            self.spills_avoided = self.live_range_splitter.spills_avoided
+        self._verify(allocation)
+        self._allocation.clear()
+        self._allocation.update(allocation)
+        self._allocated = True
+        self._spilled_index = None
+        return allocation
+
+    def reallocate(self, added=(), removed=(), resized=(), max_delta=0.1):
+        """
+        Update the last allocation after a few live ranges changed.
+        added: live ranges (name, start, end, ...) as accepted by initialize
+        removed: names of variables that no longer exist
+        resized: (name, start, end) or (name, start, end, segments) tuples
+        max_delta: largest edit, as a fraction of the variables, that is
+                   applied incrementally; bigger edits, and any edit with
+                   auto_split or after greedy mode split ranges, rebuild
+                   and allocate from scratch
+        Returns `allocation`, the read-only live view, after a full rebuild
+        as well as after an incremental update
+
+        Only the edges of the edited variables are recomputed. Each added or
+        resized variable then takes the lowest register its neighbors leave
+        free, or one freed by moving a single neighbor to another register,
+        and is spilled otherwise. Spilled variables that overlapped a removed
+        or shrunk range get a register back when one is free. Registers of
+        other variables are left alone, so the result stays conflict-free.
+        spill_traffic and spill_slots are updated in place, and spilled
+        variables next to freed space are found through an interval index of
+        spilled ranges, so the cost depends on the edit, not the function.
+        """
+        if not self._allocated:
+            raise ValueError("allocate_registers() must run before reallocate()")
+        added = [tuple(live_range) for live_range in added]
+        removed = list(removed)
+        resized = [tuple(change) for change in resized]
+        size = len(added) + len(removed) + len(resized)
+
+        for name in removed:
+            del self.live_ranges[name]
+        for live_range in added:
+            self.live_ranges[live_range[0]] = live_range
+        for name, start, end, *segments in resized:
+            live_range = self.live_ranges[name]
+            uses = live_range[3] if len(live_range) > 3 else None
+            loop_depth = live_range[4] if len(live_range) > 4 else 0
+            self.live_ranges[name] = (name, start, end, uses, loop_depth, *segments)
+
+        if (self.auto_split or self.split_pieces
+                or size > max(1, max_delta * len(self.live_ranges))):
+            self.interference_graph = GRAPH_BACKENDS[self.backend]()
+            self.initialize(list(self.live_ranges.values()))
+            self.allocate_registers()
+            return self.allocation
+
+        with self.instrumentation.phase("reallocate"):
+            if self._spilled_index is None:
+                self._spilled_index = IntervalIndex()
+                for name in self.spill_slots:
+                    var = self.interference_graph.variables[name]
+                    self._spilled_index.insert(name, var.start_point, var.end_point)
+            self._apply_delta(added, removed, resized)
+        self._verify(self._allocation)
+        return self.allocation
+
+    def _verify(self, allocation):
+        if not self.verify:
+            return
+        with self.instrumentation.phase("verify"):
+            # The timeline pass lets ranges that only touch share a register
+            self.verification = verify_allocation(self.interference_graph.variables, allocation,
+                                                  self.num_registers,
+                                                  strict=self.mode == "timeline")
+        if not self.verification.ok:
+            raise ValueError(f"Invalid allocation: {self.verification.as_dict()}")
+
+    def _apply_delta(self, added, removed, resized):
+        graph = self.interference_graph
+        allocation = self._allocation
+        freed = []      # segments no longer occupied by a removed or shrunk range
+        affected = []   # variables that need a register
+        unspill = set() # spilled variables that may now fit
+        for name in removed:
+            freed.extend(graph.variables[name].segments)
+            self._forget_spill(name)
+            graph.remove_variable(name)
+            del allocation[name]
+        for name, start, end, *segments in resized:
+            freed.extend(graph.variables[name].segments)
+            self._forget_spill(name)
+            graph.update_range(name, start, end, *segments)
+            if not graph.variables[name].spilled:
+                graph.refresh_interferences(name)
+            if allocation[name] == 'spilled':
+                unspill.add(name)
+            else:
+                affected.append(name)
+        for name, start, end, *weights in added:
+            graph.add_variable(name, start, end, *weights)
+            graph.refresh_interferences(name)
+            affected.append(name)
+
+        recolored = 0
+        for name in sorted(affected, key=lambda name: graph.variables[name].start_point):
+            allocation[name] = None
+            reg = self._free_register(name)
+            if reg is None:
+                reg = self._free_by_moving_neighbor(name)
+            if reg is None:
+                self._spill(name)
+            else:
+                allocation[name] = reg
+            recolored += 1
+
+        # Give registers back to spilled variables next to the freed space
+        for segment in freed:
+            for name in self._spilled_index.overlap(*segment):
+                if segments_overlap(graph.variables[name].segments, [segment]):
+                    unspill.add(name)
+        for name in sorted(unspill, key=lambda name: (-spill_cost(graph.variables[name]), name)):
+            self._forget_spill(name)
+            if graph.variables[name].spilled:
+                graph.restore_variable(name)
+            reg = self._free_register(name)
+            if reg is None:
+                self._spill(name)
+            else:
+                allocation[name] = reg
+                recolored += 1
+        self.instrumentation.count("incremental_recolored", recolored)
+
+    def _spill(self, name):
+        self._allocation[name] = 'spilled'
+        if self.mode == "coloring":
+            # Coloring mode keeps spilled variables detached from the graph
+            self.spill_handler.handle_spills([name])
+        var = self.interference_graph.variables[name]
+        self.spill_traffic['loads'] += spill_loads(var)
+        self.spill_traffic['stores'] += spill_stores(var)
+        # Lowest slot no overlapping spilled range holds
+        used = {self.spill_slots[other]
+                for other in self._spilled_index.overlap(var.start_point, var.end_point)}
+        self.spill_slots[name] = next(slot for slot in range(len(used) + 1) if slot not in used)
+        self._spilled_index.insert(name, var.start_point, var.end_point)
+
+    def _forget_spill(self, name):
+        """Drop name's spill slot, index entry and traffic if it is spilled"""
+        if self.spill_slots.pop(name, None) is None:
+            return
+        var = self.interference_graph.variables[name]
+        self.spill_traffic['loads'] -= spill_loads(var)
+        self.spill_traffic['stores'] -= spill_stores(var)
+        self._spilled_index.discard(name)
+
+    def _used_registers(self, name, exclude=None):
+        allocation = self._allocation
+        return {allocation[neighbor] for neighbor in self.interference_graph.neighbors(name)
+                if neighbor != exclude and allocation.get(neighbor) not in (None, 'spilled')}
+
+    def _free_register(self, name):
+        """Lowest register no neighbor of name holds, or None"""
+        used = self._used_registers(name)
+        for reg in range(self.num_registers):
+            if reg not in used:
+                return reg
+        return None
+
+    def _free_by_moving_neighbor(self, name):
+        """
+        Free a register for name by moving the only neighbor holding it to a
+        register none of that neighbor's own neighbors hold.
+        Returns: the freed register, or None
+        """
+        allocation = self._allocation
+        holders = {}
+        for neighbor in self.interference_graph.neighbors(name):
+            reg = allocation.get(neighbor)
+            if reg not in (None, 'spilled'):
+                holders.setdefault(reg, []).append(neighbor)
+        for reg, neighbors in sorted(holders.items()):
+            if len(neighbors) != 1:
+                continue
+            neighbor = neighbors[0]
+            used = self._used_registers(neighbor, exclude=name)
+            for other in range(self.num_registers):
+                if other != reg and other not in used:
+                    allocation[neighbor] = other
+                    return reg
+        return None
+
+    def _allocate_coloring(self):
+        """
+        Chaitin-style graph coloring: color the interference graph, then
+        detach the spilled variables from it.
+        """
+        if self.decompose:
+            success, spill_candidates = color_components(self.graph_coloring,
+                                                         self.max_workers)
+        else:
+            with self.instrumentation.phase("color"):
+                success, spill_candidates = self.graph_coloring.color_graph()
+        with self.instrumentation.phase("spill"):
+            self.spill_handler.handle_spills(spill_candidates)
+        colors = self.graph_coloring.colors
+        return {var_name: colors.get(var_name, 'spilled')
+                for var_name in self.interference_graph.variables}
+
+    def _allocate_linear_scan(self):
+        """
+        Linear scan (Poletto & Sarkar). Active intervals sit in a min-heap by
+        end point and free registers in a min-heap of register numbers; when
+        none is free, the interval ending furthest away is spilled. Endpoints
+        are inclusive as in the interference graph, so ranges that overlap
+        never share a register and no repair pass is needed. O(n log n).
+        Lifetime holes are not reused here: each interval is a range's hull.
+        """
+        allocation = {}
+        free_registers = list(range(self.num_registers))
+        active = []     # (end_point, seq, variable_name)
+        furthest = []   # (-end_point, seq, variable_name), lazily pruned
+        in_register = set()
+
+        intervals = []
+        for var_name, var in self.interference_graph.variables.items():
+            if var.spilled:
+                allocation[var_name] = 'spilled'
+            else:
+                intervals.append((var.start_point, var.end_point, var_name))
+        intervals.sort(key=lambda interval: (interval[0], interval[1]))
+
+        for seq, (start, end, var_name) in enumerate(intervals):
+            # Expire intervals that ended before this one starts
+            while active and active[0][0] < start:
+                _, _, expired = heapq.heappop(active)
+                if expired in in_register:
+                    in_register.remove(expired)
+                    heapq.heappush(free_registers, allocation[expired])
+
+            if free_registers:
+                reg = heapq.heappop(free_registers)
+            else:
+                while furthest and furthest[0][2] not in in_register:
+                    heapq.heappop(furthest)
+                if not furthest or -furthest[0][0] <= end:
+                    allocation[var_name] = 'spilled'
+                    continue
+                # Steal the register of the interval that ends furthest away
+                _, _, victim = heapq.heappop(furthest)
+                in_register.remove(victim)
+                reg = allocation[victim]
+                allocation[victim] = 'spilled'
+
+            allocation[var_name] = reg
+            in_register.add(var_name)
+            heapq.heappush(active, (end, seq, var_name))
+            heapq.heappush(furthest, (-end, seq, var_name))
+
+        return allocation
+
+    def _allocate_greedy(self):
+        """
+        Greedy allocation in the style of LLVM's RegAllocGreedy. Ranges are
+        taken from a priority queue, largest first, and each register keeps
+        an IntervalIndex of the ranges it holds. A range takes the first
+        register it does not conflict with; failing that, it evicts the
+        cheapest set of conflicts on one register if every one of them has
+        a lower spill weight (spill cost per live point), and the evicted
+        ranges are queued again. A range that can do neither is split
+        around its conflicts on the register where they cover the least of
+        it, once, and its pieces are queued; only then is it spilled.
+
+        Weights strictly decrease along eviction chains and each range is
+        evicted at most GREEDY_MAX_EVICTIONS times, so the queue drains in
+        O(n log n) for bounded conflict sets. The result names split pieces
+        as auto_split does; `split_pieces` maps each split range to them.
+
+        Greedy pays off when spill costs vary (uses, loop depth): it keeps
+        dense, hot ranges in registers. With unit weights linear scan's
+        furthest-end rule already spills the fewest ranges, and greedy may
+        spill more.
+        """
+        graph = self.interference_graph
+        variables = graph.variables
+        num_registers = self.num_registers
+        if not self.auto_split:
+            self.split_pieces = {}
+
+        def size(name):
+            return sum(end - start + 1 for start, end in variables[name].segments)
+
+        def weight(name):
+            return spill_cost(variables[name]) / size(name)
+
+        def conflicts(occupants, var):
+            return [name for name in occupants.overlap(var.start_point, var.end_point)
+                    if segments_overlap(variables[name].segments, var.segments)]
+
+        allocation = {}
+        occupancy = [IntervalIndex() for _ in range(num_registers)]
+        queue = []  # (-size, seq, name)
+        seq = 0
+        weights = {}
+        evictions = {}
+        split_done = set()
+        for name, var in variables.items():
+            if var.spilled:
+                allocation[name] = 'spilled'
+            else:
+                weights[name] = weight(name)
+                queue.append((-size(name), seq, name))
+                seq += 1
+        heapq.heapify(queue)
+
+        evicted = 0
+        splits = 0
+        while queue:
+            _, _, name = heapq.heappop(queue)
+            var = variables[name]
+            blocking = [conflicts(occupants, var) for occupants in occupancy]
+            reg = next((reg for reg in range(num_registers) if not blocking[reg]), None)
+
+            if reg is None:
+                # Evict the lightest set of cheaper conflicts on one register
+                best = None
+                for candidate in range(num_registers):
+                    if all(weights[other] < weights[name]
+                           and evictions.get(other, 0) < GREEDY_MAX_EVICTIONS
+                           for other in blocking[candidate]):
+                        cost = sum(weights[other] for other in blocking[candidate])
+                        if best is None or cost < best[0]:
+                            best = (cost, candidate)
+                if best is not None:
+                    reg = best[1]
+                    for other in blocking[reg]:
+                        occupancy[reg].remove(other)
+                        del allocation[other]
+                        evictions[other] = evictions.get(other, 0) + 1
+                        heapq.heappush(queue, (-size(other), seq, other))
+                        seq += 1
+                    evicted += len(blocking[reg])
+
+            if reg is not None:
+                occupancy[reg].insert(name, var.start_point, var.end_point)
+                allocation[name] = reg
+                continue
+
+            if name not in split_done:
+                # Second chance: split around the conflicts that cover the
+                # least of the range and queue the pieces again
+                best = None
+                for occupants in blocking:
+                    spans = normalize_segments(
+                        span for other in occupants
+                        for span in intersect_segments(variables[other].segments, var.segments))
+                    blocked = sum(end - start + 1 for start, end in spans)
+                    if blocked < size(name) and (best is None or blocked < best[0]):
+                        best = (blocked, spans)
+                # As in split_for_pressure, only split if spilling the blocked
+                # pieces is cheaper than spilling the whole range
+                if (best is not None
+                        and self.live_range_splitter.pieces_cost(var, best[1]) < spill_cost(var)):
+                    chain, _ = self.live_range_splitter.split_around(name, best[1])
+                    self.split_pieces[name] = chain
+                    splits += len(chain) - 1
+                    for piece in chain:
+                        split_done.add(piece)
+                        weights[piece] = weight(piece)
+                        heapq.heappush(queue, (-size(piece), seq, piece))
+                        seq += 1
+                    continue
+
+            allocation[name] = 'spilled'
+
+        self.instrumentation.count("evictions", evicted)
+        self.instrumentation.count("splits", splits)
+        return allocation
+
+    def _allocate_timeline(self):
+        with self.instrumentation.phase("timeline"):
+            allocation = self._timeline_pass()
+        with self.instrumentation.phase("post_pass"):
+            self._repair_conflicts(allocation)
+        return allocation
+
+    def _timeline_pass(self):
         # Initialize register allocation
         allocation = {}
         register_usage = {}  # time -> set of registers in use
@@ -43,24 +536,45 @@ class RegisterAllocator:
         # Create timeline of all start and end points
         timeline = []
         for var_name, var in self.interference_graph.variables.items():
+            if var.spilled:
+                allocation[var_name] = 'spilled'
+                continue
             timeline.append((var.start_point, 'start', var_name))
             timeline.append((var.end_point, 'end', var_name))
         
-        # Sort timeline by time
-        timeline.sort()
+        # Sort timeline by time; at equal times ends come before starts,
+        # except that a zero-length range must start before it can end
+        timeline.sort(key=lambda event: (
+            event[0],
+            event[1] == 'start' or
+            self.interference_graph.variables[event[2]].start_point == event[0],
+            event[1] == 'end',
+            event[2]))
         
         # Keep track of active variables at each point
         active_vars = set()
+
+        # With profile data, a new range may take the register of a cheaper
+        # active range (lowest spill cost/degree) instead of spilling itself
+        weighted = has_weights(self.interference_graph.variables)
+
+        def priority(name):
+            return spill_priority(spill_cost(self.interference_graph.variables[name]),
+                                  self.interference_graph.degree(name))
         
         # Process timeline events
         for time, event_type, var_name in timeline:
             if event_type == 'start':
                 var = self.interference_graph.variables[var_name]
                 
-                # Get current register usage
+                # Get current register usage; an active range in a lifetime
+                # hole that spans this whole range leaves its register free
                 used_registers = set()
                 for active_var in active_vars:
-                    if active_var in allocation and allocation[active_var] != 'spilled':
+                    if (active_var in allocation and allocation[active_var] != 'spilled'
+                            and segments_overlap(
+                                self.interference_graph.variables[active_var].segments,
+                                var.segments)):
                         used_registers.add(allocation[active_var])
                 
                 # Find an available register
@@ -72,8 +586,8 @@ class RegisterAllocator:
                         for active_var in active_vars:
                             if active_var in allocation and allocation[active_var] == r:
                                 active_var_obj = self.interference_graph.variables[active_var]
-                                if not (active_var_obj.end_point <= var.start_point or 
-                                      var.end_point <= active_var_obj.start_point):
+                                if segments_overlap(active_var_obj.segments, var.segments,
+                                                    strict=True):
                                     is_compatible = False
                                     break
                         if is_compatible:
@@ -86,8 +600,21 @@ class RegisterAllocator:
                         register_usage[time] = set()
                     register_usage[time].add(reg)
                 else:
-                    # If no register is available, mark as spilled
-                    allocation[var_name] = 'spilled'
+                    victim = None
+                    if weighted:
+                        # active_vars is a set, so break priority ties by name
+                        # to keep the choice independent of the hash seed
+                        victim = min((active_var for active_var in active_vars
+                                      if allocation.get(active_var, 'spilled') != 'spilled'),
+                                     key=lambda name: (priority(name), name), default=None)
+                        if victim is not None and priority(victim) >= priority(var_name):
+                            victim = None
+                    if victim is not None:
+                        allocation[var_name] = allocation[victim]
+                        allocation[victim] = 'spilled'
+                    else:
+                        # If no register is available, mark as spilled
+                        allocation[var_name] = 'spilled'
                 
                 active_vars.add(var_name)
             
@@ -97,35 +624,43 @@ class RegisterAllocator:
                 if time in register_usage and var_name in allocation:
                     register_usage[time].discard(allocation[var_name])
 
-        # Post-process to ensure no overlapping variables have same register
-        for var1_name, var1 in self.interference_graph.variables.items():
-            if allocation[var1_name] != 'spilled':
-                for var2_name, var2 in self.interference_graph.variables.items():
-                    if (var1_name != var2_name and 
-                        allocation[var2_name] != 'spilled' and 
-                        allocation[var1_name] == allocation[var2_name]):
-                        
-                        # Check if their live ranges overlap
-                        if not (var1.end_point <= var2.start_point or 
-                               var2.end_point <= var1.start_point):
-                            
-                            # Try to find a different register for var2
-                            new_reg = None
-                            for reg in range(self.num_registers):
-                                if reg != allocation[var1_name]:
-                                    can_use = True
-                                    for other_var, _ in self.interference_graph.variables.items():
-                                        if (other_var != var2_name and 
-                                            allocation.get(other_var) == reg):
-                                            can_use = False
-                                            break
-                                    if can_use:
-                                        new_reg = reg
-                                        break
-                            
-                            if new_reg is not None:
-                                allocation[var2_name] = new_reg
-                            else:
-                                allocation[var2_name] = 'spilled'
-
-        return allocation
\ No newline at end of file
+        return allocation
+
+    def _repair_conflicts(self, allocation):
+        """
+        Move one variable of every conflicting pair the verifier finds to a
+        register that is free over its whole range, or spill it. Registers
+        are checked against per-register interval indexes, so the pass costs
+        O(n log n) plus O(k log n) per conflict.
+        """
+        variables = self.interference_graph.variables
+        report = verify_allocation(variables, allocation, self.num_registers, strict=True)
+        reassignments = 0
+        if report.conflicts:
+            occupancy = [IntervalIndex() for _ in range(self.num_registers)]
+            for var_name, reg in allocation.items():
+                if reg != 'spilled':
+                    var = variables[var_name]
+                    occupancy[reg].insert(var_name, var.start_point, var.end_point)
+
+            def is_free(reg, var):
+                return not any(segments_overlap(variables[other].segments, var.segments,
+                                                strict=True)
+                               for other in occupancy[reg].overlap(var.start_point, var.end_point))
+
+            for var1_name, var2_name, reg in report.conflicts:
+                if allocation[var1_name] != reg or allocation[var2_name] != reg:
+                    continue  # already resolved by an earlier move
+                var2 = variables[var2_name]
+                occupancy[reg].remove(var2_name)
+                new_reg = next((other for other in range(self.num_registers)
+                                if other != reg and is_free(other, var2)), None)
+                if new_reg is not None:
+                    allocation[var2_name] = new_reg
+                    occupancy[new_reg].insert(var2_name, var2.start_point, var2.end_point)
+                else:
+                    allocation[var2_name] = 'spilled'
+                reassignments += 1
+
+        self.instrumentation.count("post_pass_reassignments", reassignments)
+        return allocation
@@ -8,7 +8,7 @@ class NaiveAllocator:
         Returns a dictionary of variable_name -> register_number or 'spilled'
         """
         allocation = {}
-        for i, (var_name, _, _) in enumerate(live_ranges):
+        for i, (var_name, *_) in enumerate(live_ranges):
             if i < self.num_registers:
                 allocation[var_name] = i  # Assign a register if available
             else:
@@ -0,0 +1,170 @@
+# pressure.py
+"""
+Register-pressure analysis.
+
+Live ranges are closed intervals of integer program points, so the
+interference graph is an interval graph and its chromatic number is MaxLive,
+the largest number of simultaneously live variables. MaxLive registers are
+always enough, and at least MaxLive - num_registers variables must spill.
+"""
+from bisect import bisect_right
+
+from interference_graph import normalize_segments
+from interval_index import IntervalIndex
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; the pure-Python sweep is always available
+    np = None
+
+# Inputs at least this large use the NumPy path when NumPy is installed
+NUMPY_THRESHOLD = 10000
+
+
+class PressureProfile:
+    """
+    Step function of register pressure: pressures[i] variables are live at
+    every point in [points[i], points[i + 1]). Pressure is 0 before
+    points[0] and from points[-1] on.
+    """
+    def __init__(self, points, pressures, live_ranges):
+        self.points = points
+        self.pressures = pressures
+        self.live_ranges = live_ranges
+        self.max_live = max(pressures, default=0)
+        self._index = None
+        self._holes = None  # name -> segments, for ranges with lifetime holes
+
+    def pressure_at(self, point):
+        i = bisect_right(self.points, point)
+        return self.pressures[i - 1] if i else 0
+
+    def regions_above(self, threshold):
+        """Maximal [start, end] point ranges where pressure exceeds `threshold`"""
+        regions = []
+        start = None
+        for i, pressure in enumerate(self.pressures):
+            if pressure > threshold:
+                if start is None:
+                    start = self.points[i]
+            elif start is not None:
+                regions.append((start, self.points[i] - 1))
+                start = None
+        # The curve always ends at zero, so every region has been closed
+        return regions
+
+    def excess_regions(self, num_registers):
+        """Regions where more than num_registers variables are live"""
+        return self.regions_above(num_registers)
+
+    def peaks(self):
+        """Regions where pressure equals MaxLive"""
+        if self.max_live == 0:
+            return []
+        return self.regions_above(self.max_live - 1)
+
+    def live_at(self, point):
+        """Names of the variables live at `point`"""
+        if self._index is None:
+            self._index = IntervalIndex()
+            self._holes = {}
+            for live_range in self.live_ranges:
+                self._index.insert(live_range[0], live_range[1], live_range[2])
+                segments = _segments(live_range)
+                if len(segments) > 1:
+                    self._holes[live_range[0]] = segments
+        # The index holds hulls; drop ranges in a hole at `point`
+        return [name for name in self._index.stab(point)
+                if name not in self._holes
+                or any(start <= point <= end for start, end in self._holes[name])]
+
+    def peak_variables(self):
+        """
+        List of ((start, end), names) for the parts of the peak regions over
+        which the live set does not change: every name is live throughout
+        its region. A peak region is cut wherever one variable dies and
+        another takes its place.
+        """
+        result = []
+        for i, pressure in enumerate(self.pressures):
+            if self.max_live == 0 or pressure != self.max_live:
+                continue
+            start, end = self.points[i], self.points[i + 1] - 1
+            names = sorted(self.live_at(start))
+            if result and result[-1][0][1] == start - 1 and result[-1][1] == names:
+                result[-1] = ((result[-1][0][0], end), names)
+            else:
+                result.append(((start, end), names))
+        return result
+
+    def fits(self, num_registers):
+        """True if allocation can succeed without spilling"""
+        return self.max_live <= num_registers
+
+    def min_spills(self, num_registers):
+        """Lower bound on the number of variables any allocation must spill"""
+        return max(0, self.max_live - num_registers)
+
+
+def pressure_profile(live_ranges, use_numpy=None):
+    """
+    Compute the pressure curve of a function in O(n log n).
+    live_ranges: List of (variable_name, start_point, end_point, ...), as
+                 accepted by InterferenceGraph, lifetime holes included
+
+    Each segment adds +1 at its start and -1 just after its end; sorting
+    the events and taking a prefix sum gives the curve. A range is not
+    counted in its holes. Large inputs use NumPy when it is installed.
+    """
+    live_ranges = list(live_ranges)
+    segments = [(live_range[0], start, end)
+                for live_range in live_ranges for start, end in _segments(live_range)]
+    if use_numpy is None:
+        use_numpy = np is not None and len(segments) >= NUMPY_THRESHOLD
+    if use_numpy:
+        if np is None:
+            raise ImportError("pressure_profile(use_numpy=True) requires NumPy")
+        points, pressures = _sweep_numpy(segments)
+    else:
+        points, pressures = _sweep(segments)
+    return PressureProfile(points, pressures, live_ranges)
+
+
+def _segments(live_range):
+    """Segments of a live-range tuple: its hull unless it lists holes"""
+    if len(live_range) > 5 and live_range[5] is not None:
+        return normalize_segments(live_range[5])
+    return [(live_range[1], live_range[2])]
+
+
+def _sweep(live_ranges):
+    events = []
+    for live_range in live_ranges:
+        events.append((live_range[1], 1))
+        events.append((live_range[2] + 1, -1))
+    events.sort()
+
+    points = []
+    pressures = []
+    pressure = 0
+    for point, delta in events:
+        pressure += delta
+        if points and points[-1] == point:
+            pressures[-1] = pressure
+        else:
+            points.append(point)
+            pressures.append(pressure)
+    return points, pressures
+
+
+def _sweep_numpy(live_ranges):
+    n = len(live_ranges)
+    starts = np.fromiter((live_range[1] for live_range in live_ranges), dtype=np.int64, count=n)
+    ends = np.fromiter((live_range[2] for live_range in live_ranges), dtype=np.int64, count=n) + 1
+    starts.sort()
+    ends.sort()
+    points = np.unique(np.concatenate([starts, ends]))
+    # Pressure from each point on: ranges started by then minus ranges ended by then
+    pressures = (np.searchsorted(starts, points, side="right")
+                 - np.searchsorted(ends, points, side="right"))
+    return points.tolist(), pressures.tolist()
@@ -0,0 +1,328 @@
+# service.py
+"""
+Asyncio allocation service.
+
+One long-lived process keeps the allocator warm and serves many clients
+over a Unix socket or localhost TCP. Every message is a 4-byte big-endian
+length followed by that many bytes of JSON:
+
+    request:  {"id": 1, "live_ranges": [["x", 0, 10], ...],
+               "num_registers": 8, "mode": "linear_scan"}
+    response: {"id": 1, "allocation": {"x": 0, ...}}  or  {"id": 1, "error": "..."}
+
+A request {"id": 2, "stats": true} returns the server's latency
+percentiles and queue depth instead. Responses carry the request id and may
+arrive out of order, so a client can pipeline requests on one connection.
+
+Requests wait in a bounded queue; when it is full, the server stops
+reading from connections until it drains. A batcher collects up to
+`batch_size` requests (waiting at most `batch_delay` seconds after the
+first) and hands them to a process pool as one job.
+
+    python service.py --socket /tmp/regalloc.sock --workers 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import struct
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from batch import allocate_function
+from main import ALLOCATION_MODES
+
+FRAME_HEADER = struct.Struct(">I")
+MAX_FRAME = 64 * 1024 * 1024
+
+
+async def read_frame(reader):
+    """Next JSON message from `reader`, or None at end of stream"""
+    try:
+        header = await reader.readexactly(FRAME_HEADER.size)
+    except asyncio.IncompleteReadError:
+        return None
+    (length,) = FRAME_HEADER.unpack(header)
+    if length > MAX_FRAME:
+        raise ValueError(f"Frame of {length} bytes exceeds {MAX_FRAME}")
+    return json.loads(await reader.readexactly(length))
+
+
+def write_frame(writer, message):
+    payload = json.dumps(message, separators=(",", ":")).encode()
+    writer.write(FRAME_HEADER.pack(len(payload)) + payload)
+
+
+def _allocate_requests(requests):
+    """Worker job: allocate (live_ranges, num_registers, mode) requests in order"""
+    results = []
+    for live_ranges, num_registers, mode in requests:
+        try:
+            results.append(("allocation", allocate_function(live_ranges, num_registers, mode)))
+        except (ValueError, TypeError, KeyError) as e:
+            results.append(("error", f"{type(e).__name__}: {e}"))
+    return results
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+class AllocationServer:
+    """
+    max_workers: size of the process pool; 0 allocates in a thread of this
+                 process instead (None: one worker per CPU)
+    batch_size / batch_delay: largest micro-batch and the longest time its
+                 first request waits for company
+    max_queue: requests that may wait before connections are throttled
+    """
+    def __init__(self, max_workers=None, batch_size=32, batch_delay=0.002, max_queue=1024,
+                 latency_window=10000):
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.max_queue = max_queue
+        self._latencies = deque(maxlen=latency_window)  # seconds, most recent requests
+        self._queue = None
+        self._executor = None
+        self._servers = []
+        self._batcher = None
+        self._in_flight = None
+        self._batch_tasks = set()  # the loop only keeps weak references to tasks
+        self.requests = 0
+        self.batches = 0
+
+    async def start_unix(self, path):
+        self._start()
+        server = await asyncio.start_unix_server(self._handle, path=path)
+        self._servers.append(server)
+        return server
+
+    async def start_tcp(self, host="127.0.0.1", port=0):
+        """Listen on localhost TCP; port 0 picks a free port (see `address`)"""
+        self._start()
+        server = await asyncio.start_server(self._handle, host=host, port=port)
+        self._servers.append(server)
+        return server
+
+    @property
+    def address(self):
+        """Address of the first listening socket"""
+        return self._servers[0].sockets[0].getsockname()
+
+    def _start(self):
+        if self._queue is not None:
+            return
+        self._queue = asyncio.Queue(self.max_queue)
+        workers = self.max_workers
+        if workers != 0:
+            workers = workers or os.cpu_count() or 1
+            self._executor = ProcessPoolExecutor(max_workers=workers)
+        # At most two batches per worker are submitted at once; the rest
+        # wait in the queue, where they count towards backpressure
+        self._in_flight = asyncio.Semaphore(2 * (workers or 1))
+        self._batcher = asyncio.ensure_future(self._run_batches())
+
+    async def close(self):
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+        if self._batcher is not None:
+            self._batcher.cancel()
+            try:
+                await self._batcher
+            except asyncio.CancelledError:
+                pass
+        # Let batches already handed to the pool deliver their responses
+        if self._batch_tasks:
+            await asyncio.gather(*self._batch_tasks, return_exceptions=True)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+    def stats(self):
+        """Latency percentiles (seconds) over recent requests and queue depth"""
+        latencies = sorted(self._latencies)
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "p50": _percentile(latencies, 0.50),
+            "p90": _percentile(latencies, 0.90),
+            "p99": _percentile(latencies, 0.99),
+        }
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    message = await read_frame(reader)
+                except (ValueError, asyncio.IncompleteReadError):
+                    break
+                if message is None:
+                    break
+                if not isinstance(message, dict):
+                    write_frame(writer, {"id": None, "error": "Request must be a JSON object"})
+                    continue
+                if message.get("stats"):
+                    write_frame(writer, {"id": message.get("id"), "stats": self.stats()})
+                    continue
+                mode = message.get("mode", "timeline")
+                if mode not in ALLOCATION_MODES:
+                    write_frame(writer, {"id": message.get("id"),
+                                         "error": f"Unknown allocation mode: {mode}"})
+                    continue
+                try:
+                    request = ([tuple(live_range) for live_range in message["live_ranges"]],
+                               int(message["num_registers"]), mode)
+                except (KeyError, TypeError, ValueError) as e:
+                    write_frame(writer, {"id": message.get("id"),
+                                         "error": f"Malformed request: {type(e).__name__}: {e}"})
+                    continue
+                # Blocks while the queue is full, so a flooding client stops
+                # being read until the workers catch up
+                await self._queue.put((request, message.get("id"), writer, time.perf_counter()))
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def _run_batches(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.batch_delay
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._in_flight.acquire()
+            task = asyncio.ensure_future(self._run_batch(batch))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+
+    async def _run_batch(self, batch):
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(
+                self._executor, _allocate_requests, [request for request, *_ in batch])
+        except Exception as e:  # the pool itself failed; report it on every request
+            results = [("error", f"{type(e).__name__}: {e}")] * len(batch)
+        finally:
+            self._in_flight.release()
+        self.batches += 1
+        now = time.perf_counter()
+        for (_, request_id, writer, received), (key, value) in zip(batch, results):
+            self.requests += 1
+            self._latencies.append(now - received)
+            if not writer.is_closing():
+                write_frame(writer, {"id": request_id, key: value})
+
+
+class AllocationClient:
+    """
+    Pipelining client: any number of allocate() calls may be awaited at
+    once over the one connection; responses are matched by request id.
+    """
+    def __init__(self, reader, writer):
+        self._reader = reader
+        self._writer = writer
+        self._next_id = 0
+        self._pending = {}  # request id -> future
+        self._receiver = asyncio.ensure_future(self._receive())
+
+    @classmethod
+    async def connect_unix(cls, path):
+        return cls(*await asyncio.open_unix_connection(path))
+
+    @classmethod
+    async def connect_tcp(cls, host="127.0.0.1", port=None):
+        return cls(*await asyncio.open_connection(host, port))
+
+    async def _receive(self):
+        try:
+            while True:
+                message = await read_frame(self._reader)
+                if message is None:
+                    break
+                future = self._pending.pop(message["id"], None)
+                if future is not None and not future.done():
+                    future.set_result(message)
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("allocation service closed the connection"))
+            self._pending.clear()
+
+    async def _request(self, message):
+        if self._receiver.done():
+            raise ConnectionError("allocation service closed the connection")
+        request_id = self._next_id
+        self._next_id += 1
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        write_frame(self._writer, dict(message, id=request_id))
+        await self._writer.drain()
+        return await future
+
+    async def allocate(self, live_ranges, num_registers, mode="timeline"):
+        """Allocation of one function, as RegisterAllocator.allocate_registers returns it"""
+        response = await self._request({"live_ranges": [list(live_range) for live_range in live_ranges],
+                                        "num_registers": num_registers, "mode": mode})
+        if "error" in response:
+            raise ValueError(response["error"])
+        return response["allocation"]
+
+    async def stats(self):
+        return (await self._request({"stats": True}))["stats"]
+
+    async def close(self):
+        self._writer.close()
+        await self._writer.wait_closed()
+        self._receiver.cancel()
+        try:
+            await self._receiver
+        except asyncio.CancelledError:
+            pass
+
+
+async def _serve(args):
+    server = AllocationServer(max_workers=args.workers, batch_size=args.batch_size,
+                              batch_delay=args.batch_delay, max_queue=args.max_queue)
+    if args.socket:
+        listener = await server.start_unix(args.socket)
+    else:
+        listener = await server.start_tcp(args.host, args.port)
+    print(f"listening on {server.address}", file=sys.stderr)
+    try:
+        await listener.serve_forever()
+    finally:
+        await server.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve register allocation over a local socket")
+    parser.add_argument("--socket", help="Unix socket path (default: localhost TCP)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="process-pool size; 0 allocates in the server process")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--batch-delay", type=float, default=0.002)
+    parser.add_argument("--max-queue", type=int, default=1024)
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
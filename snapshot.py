@@ -0,0 +1,122 @@
+# snapshot.py
+"""
+Binary snapshots of interference graphs.
+
+A snapshot is a 48-byte header (magic, version, node count, adjacency
+length, name-table size, number of ranges with lifetime holes, their total
+segment count) followed by 8-byte aligned little-endian int64 arrays and
+the UTF-8 name table:
+
+    starts[n] ends[n] indptr[n + 1] indices[m] name_offsets[n + 1]
+    hole_ids[h] segment_offsets[h + 1] bounds[2 * s] names
+
+Ranges with holes list their segments as (start, end) pairs in `bounds`,
+those of hole_ids[i] from segment_offsets[i] on. load_snapshot maps the
+file read-only and hands memoryviews of the arrays to a
+CSRInterferenceGraph, so nothing but the names and the segments of ranges
+with holes is copied and any number of processes can load the same file
+and share its pages.
+
+    save_snapshot(allocator.interference_graph, "f.graph")
+    graph = load_snapshot("f.graph")
+    GraphColoring(graph, 8).color_graph()
+"""
+import mmap
+import struct
+import sys
+from array import array
+
+from csr_graph import CSRInterferenceGraph
+
+SNAPSHOT_MAGIC = b"RAIG"
+SNAPSHOT_VERSION = 2
+SNAPSHOT_HEADER = struct.Struct("<4sIQQQQQ")
+
+
+def save_snapshot(graph, path):
+    """
+    Write the live ranges and current adjacency of `graph` (any backend)
+    to `path`, lifetime holes included. Profile weights and spill state are
+    not stored.
+    """
+    names = list(graph.variables)
+    ids = {name: i for i, name in enumerate(names)}
+    starts = array("q")
+    ends = array("q")
+    indptr = array("q", [0])
+    indices = array("q")
+    hole_ids = array("q")
+    segment_offsets = array("q", [0])
+    bounds = array("q")
+    for name in names:
+        var = graph.variables[name]
+        starts.append(var.start_point)
+        ends.append(var.end_point)
+        indices.extend(sorted(ids[neighbor] for neighbor in graph.neighbors(name)))
+        indptr.append(len(indices))
+        segments = var.segments
+        if len(segments) > 1:
+            hole_ids.append(ids[name])
+            for start, end in segments:
+                bounds.extend((start, end))
+            segment_offsets.append(len(bounds) // 2)
+
+    encoded = [name.encode() for name in names]
+    name_offsets = array("q", [0])
+    for raw in encoded:
+        name_offsets.append(name_offsets[-1] + len(raw))
+
+    with open(path, "wb") as f:
+        f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION,
+                                     len(names), len(indices), name_offsets[-1],
+                                     len(hole_ids), len(bounds) // 2))
+        for values in (starts, ends, indptr, indices, name_offsets,
+                       hole_ids, segment_offsets, bounds):
+            if sys.byteorder != "little":
+                values.byteswap()
+            values.tofile(f)
+        f.write(b"".join(encoded))
+
+
+def load_snapshot(path):
+    """Map a snapshot written by save_snapshot; returns a CSRInterferenceGraph"""
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if len(mm) < SNAPSHOT_HEADER.size:
+        mm.close()
+        raise ValueError(f"{path}: truncated graph snapshot")
+    magic, version, n, m, names_size, h, s = SNAPSHOT_HEADER.unpack_from(mm)
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+        mm.close()
+        raise ValueError(f"{path}: not a version {SNAPSHOT_VERSION} graph snapshot")
+    lengths = (n, n, n + 1, m, n + 1, h, h + 1, 2 * s)
+    expected = SNAPSHOT_HEADER.size + 8 * sum(lengths) + names_size
+    size = len(mm)
+    if size != expected:
+        mm.close()
+        raise ValueError(f"{path}: snapshot is {size} bytes, header implies {expected}")
+
+    view = memoryview(mm)
+    offset = SNAPSHOT_HEADER.size
+    arrays = []
+    for length in lengths:
+        section = view[offset:offset + 8 * length]
+        if sys.byteorder == "little":
+            arrays.append(section.cast("q"))
+        else:
+            values = array("q")
+            values.frombytes(section)
+            values.byteswap()
+            arrays.append(values)
+        offset += 8 * length
+    starts, ends, indptr, indices, name_offsets, hole_ids, segment_offsets, bounds = arrays
+    segments = {}
+    for i in range(h):
+        segments[int(hole_ids[i])] = [
+            (int(bounds[2 * j]), int(bounds[2 * j + 1]))
+            for j in range(segment_offsets[i], segment_offsets[i + 1])]
+
+    blob = view[offset:offset + names_size]
+    names = [str(blob[name_offsets[i]:name_offsets[i + 1]], "utf-8") for i in range(n)]
+    # The views keep the mapping alive for as long as the graph uses them
+    return CSRInterferenceGraph(names, starts, ends, indptr, indices, segments)
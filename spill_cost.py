@@ -0,0 +1,58 @@
+# spill_cost.py
+"""
+Spill-cost model.
+
+A live range may carry a use count (reads of the value) and a loop depth.
+Spilling it costs one store per definition and one load per use, each
+executed about LOOP_WEIGHT ** loop_depth times. Ranges without a use count
+are assumed to be read once.
+"""
+
+LOOP_WEIGHT = 10
+DEFAULT_USES = 1
+
+
+def execution_weight(var):
+    return LOOP_WEIGHT ** (var.loop_depth or 0)
+
+
+def spill_loads(var):
+    uses = DEFAULT_USES if var.uses is None else var.uses
+    return uses * execution_weight(var)
+
+
+def spill_stores(var):
+    return execution_weight(var)
+
+
+def spill_cost(var):
+    """Estimated dynamic loads plus stores if `var` lives in memory"""
+    return spill_loads(var) + spill_stores(var)
+
+
+def spill_priority(cost, degree):
+    """Chaitin's cost/degree: the lowest value is the best spill choice"""
+    if degree == 0:
+        return float("inf")
+    return cost / degree
+
+
+def has_weights(variables):
+    """True if any variable carries use or loop-depth information"""
+    return any(var.uses is not None or var.loop_depth for var in variables.values())
+
+
+def estimate_spill_traffic(variables, spilled):
+    """
+    Estimated dynamic memory traffic caused by spilling.
+    variables: name -> Variable mapping
+    spilled: iterable of spilled variable names
+    Returns: {'loads': ..., 'stores': ...}
+    """
+    loads = 0
+    stores = 0
+    for name in spilled:
+        var = variables[name]
+        loads += spill_loads(var)
+        stores += spill_stores(var)
+    return {'loads': loads, 'stores': stores}
@@ -1,21 +1,66 @@
+import heapq
+
+from instrumentation import NULL_INSTRUMENTATION
+
+
 class SpillHandler:
-    def __init__(self, interference_graph):
+    def __init__(self, interference_graph, instrumentation=None):
         self.graph = interference_graph
+        self.instrumentation = instrumentation or NULL_INSTRUMENTATION
+        self.spill_slots = {}  # variable_name -> stack slot, see assign_spill_slots
         
     def handle_spills(self, spill_candidates):
         """
         Marks variables for spilling and updates interference graph
         Returns modified interference graph
+
+        The whole spill set is detached in one pass proportional to its
+        total degree; edges between two spilled variables are dropped once.
         """
-        for var_name in spill_candidates:
-            var = self.graph.variables[var_name]
-            var.spilled = True
-            
-            # Remove interferences for spilled variable
-            for interfering_var in var.interferences.copy():
-                self.graph.variables[interfering_var].interferences.remove(var_name)
-                var.interferences.remove(interfering_var)
-                self.graph.edges.remove((var_name, interfering_var))
-                self.graph.edges.remove((interfering_var, var_name))
+        spilled = list(spill_candidates)
+        for var_name in spilled:
+            self.graph.variables[var_name].spilled = True
+            self.graph.index.discard(var_name)
+
+        # Remove interferences for spilled variables
+        edges_removed = self.graph.detach_variables(spilled)
                 
+        self.instrumentation.count("spilled_variables", len(spilled))
+        self.instrumentation.count("spill_edges_removed", edges_removed)
         return self.graph
+
+    def assign_spill_slots(self, spilled=None):
+        """
+        Give each spilled variable a stack slot, sharing slots between
+        variables whose live ranges do not overlap.
+        spilled: variable names (default: every variable marked spilled)
+        Returns: dictionary of variable_name -> slot number
+
+        The spilled ranges form an interval graph, so taking them in start
+        order and reusing the lowest freed slot needs exactly as many slots
+        as the most spilled variables live at once.
+        """
+        variables = self.graph.variables
+        if spilled is None:
+            spilled = [name for name, var in variables.items() if var.spilled]
+        ranges = sorted((variables[name].start_point, variables[name].end_point, name)
+                        for name in spilled)
+
+        slots = {}
+        active = []      # (end_point, slot)
+        free_slots = []  # min-heap of released slots
+        num_slots = 0
+        for start, end, name in ranges:
+            while active and active[0][0] < start:
+                heapq.heappush(free_slots, heapq.heappop(active)[1])
+            if free_slots:
+                slot = heapq.heappop(free_slots)
+            else:
+                slot = num_slots
+                num_slots += 1
+            slots[name] = slot
+            heapq.heappush(active, (end, slot))
+
+        self.spill_slots = slots
+        self.instrumentation.count("spill_slots", num_slots)
+        return slots
@@ -1,13 +1,36 @@
 import pytest
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
 import time
-from interference_graph import InterferenceGraph, Variable
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from interference_graph import InterferenceGraph, Variable, normalize_segments, segments_overlap
+from compact_graph import CompactInterferenceGraph
+from implicit_graph import ImplicitInterferenceGraph
+from interval_index import IntervalIndex
+from csr_graph import build_csr
+from snapshot import load_snapshot, save_snapshot
+from pressure import pressure_profile
 from graph_coloring import GraphColoring
+from components import color_components, connected_components
 from spill_handler import SpillHandler
+from spill_cost import estimate_spill_traffic
 from coalesce_handler import CoalesceHandler
 from live_range_splitter import LiveRangeSplitter
 from utils import visualize_allocation
-from main import RegisterAllocator
+from main import ALLOCATION_MODES, RegisterAllocator
+from instrumentation import NULL_INSTRUMENTATION, Instrumentation
 from naive_allocator import NaiveAllocator
+from verifier import verify_allocation
+import batch
+from allocation_cache import AllocationCache, CachingRegisterAllocator, cache_key, canonicalize
+import cli
+from service import AllocationClient, AllocationServer, read_frame, write_frame
+import benchmark
 
 # =========================
 # Tests for InterferenceGraph
@@ -39,6 +62,349 @@ def test_build_from_live_ranges():
     assert "x" in graph.variables["y"].interferences
     assert "z" in graph.variables["y"].interferences
 
+def test_build_sweep_matches_pairwise():
+    rng = random.Random(7)
+    live_ranges = []
+    for i in range(200):
+        start = rng.randint(0, 500)
+        live_ranges.append((f"v{i}", start, start + rng.randint(0, 40)))
+    sweep = InterferenceGraph()
+    sweep.build_from_live_ranges(live_ranges)
+    pairwise = InterferenceGraph()
+    pairwise.build_from_live_ranges(live_ranges, method="pairwise")
+    assert sweep.edges == pairwise.edges
+
+def test_build_sweep_inclusive_endpoints():
+    graph = InterferenceGraph()
+    graph.build_from_live_ranges([("a", 0, 10), ("b", 10, 20), ("c", 21, 30)])
+    assert "b" in graph.variables["a"].interferences
+    assert not graph.variables["c"].interferences
+
+def test_segments_overlap_and_normalize():
+    assert normalize_segments([(8, 10), (0, 3), (4, 5)]) == [(0, 5), (8, 10)]
+    assert segments_overlap([(0, 3), (8, 10)], [(10, 12)])
+    assert not segments_overlap([(0, 3), (8, 10)], [(10, 12)], strict=True)
+    assert not segments_overlap([(0, 3), (8, 10)], [(4, 7), (11, 12)])
+    with pytest.raises(ValueError):
+        InterferenceGraph().add_variable("x", 0, 12, segments=[(0, 3), (8, 10)])
+
+@pytest.mark.parametrize("graph_class", [InterferenceGraph, CompactInterferenceGraph])
+def test_build_with_lifetime_holes(graph_class):
+    live_ranges = [("x", 0, 30, None, 0, [(0, 5), (20, 30)]), ("y", 8, 15), ("z", 4, 22)]
+    graph = graph_class()
+    graph.build_from_live_ranges(live_ranges)
+    assert not graph.interferes("x", "y")
+    assert graph.interferes("x", "z") and graph.interferes("y", "z")
+    assert set(graph.live_at(10)) == {"y", "z"}
+    pairwise = InterferenceGraph()
+    pairwise.build_from_live_ranges(live_ranges, method="pairwise")
+    assert graph.edges == pairwise.edges
+
+# =========================
+# Tests for CompactInterferenceGraph
+# =========================
+
+def test_compact_graph_matches_default():
+    live_ranges = [("x", 0, 10), ("y", 5, 15), ("z", 12, 20), ("w", 30, 40)]
+    default = InterferenceGraph()
+    default.build_from_live_ranges(live_ranges)
+    compact = CompactInterferenceGraph()
+    compact.build_from_live_ranges(live_ranges)
+    assert compact.edges == default.edges
+    assert compact.edge_count() == default.edge_count() == 2
+    for name in default.variables:
+        assert compact.degree(name) == default.degree(name)
+        assert set(compact.neighbors(name)) == default.variables[name].interferences
+    assert compact.variables["z"].start_point == 12
+
+def test_compact_graph_runs_handlers():
+    graph = CompactInterferenceGraph()
+    graph.build_from_live_ranges([("a", 0, 10), ("b", 5, 15), ("c", 20, 30)])
+    coloring = GraphColoring(graph, 2)
+    success, spill_candidates = coloring.color_graph()
+    assert success and not spill_candidates
+    assert coloring.colors["a"] != coloring.colors["b"]
+
+    assert CoalesceHandler(graph).coalesce_variables("a", "c")
+    assert "c" not in graph.variables
+    assert graph.variables["a"].end_point == 30
+
+    SpillHandler(graph).handle_spills({"a"})
+    assert graph.variables["a"].spilled
+    assert graph.degree("b") == 0
+    assert graph.edge_count() == 0
+
+def test_compact_graph_uses_less_memory_than_default():
+    rng = random.Random(1)
+    live_ranges = []
+    for i in range(5000):
+        start = rng.randrange(50000)
+        live_ranges.append((f"v{i}", start, start + rng.randrange(1, 10)))
+
+    def traced_size(graph_class):
+        tracemalloc.start()
+        try:
+            graph = graph_class()
+            graph.build_from_live_ranges(live_ranges)
+            return tracemalloc.get_traced_memory()[0], graph
+        finally:
+            tracemalloc.stop()
+
+    default_size, default = traced_size(InterferenceGraph)
+    compact_size, compact = traced_size(CompactInterferenceGraph)
+    assert compact.edge_count() == default.edge_count()
+    # Sparse adjacency must not grow with the largest neighbor id
+    assert compact_size < default_size
+
+def test_compact_graph_dense_build_keeps_up_with_default():
+    # Every pair overlaps: the build must not test membership per edge
+    live_ranges = [(f"v{i}", 0, 100) for i in range(600)]
+
+    def build_time(graph_class):
+        start = time.perf_counter()
+        graph = graph_class()
+        graph.build_from_live_ranges(live_ranges)
+        return time.perf_counter() - start, graph
+
+    default_time, default = build_time(InterferenceGraph)
+    compact_time, compact = build_time(CompactInterferenceGraph)
+    assert compact.edge_count() == default.edge_count() == 600 * 599 // 2
+    assert compact.interferes("v0", "v599") and compact.degree("v7") == 599
+    assert compact_time < 2 * default_time + 0.05
+
+def test_compact_graph_batch_spill_keeps_up_with_default():
+    live_ranges = [(f"v{i}", 0, 100) for i in range(600)]
+    spilled = [f"v{i}" for i in range(0, 600, 2)]
+
+    def spill_time(graph_class):
+        graph = graph_class()
+        graph.build_from_live_ranges(live_ranges)
+        start = time.perf_counter()
+        SpillHandler(graph).handle_spills(spilled)
+        return time.perf_counter() - start, graph
+
+    default_time, default = spill_time(InterferenceGraph)
+    compact_time, compact = spill_time(CompactInterferenceGraph)
+    assert compact.edge_count() == default.edge_count() == 300 * 299 // 2
+    assert compact.neighbors("v1") == [f"v{i}" for i in range(3, 600, 2)]
+    assert compact_time < 2 * default_time + 0.05
+
+def test_register_allocator_compact_backend():
+    live_ranges = [("x", 0, 10), ("y", 5, 15), ("z", 12, 20)]
+    default = RegisterAllocator(2)
+    default.initialize(live_ranges)
+    compact = RegisterAllocator(2, backend="compact")
+    compact.initialize(live_ranges)
+    assert compact.allocate_registers() == default.allocate_registers()
+
+# =========================
+# Tests for ImplicitInterferenceGraph
+# =========================
+
+def test_implicit_graph_matches_default():
+    live_ranges = random_live_ranges(150, seed=17)
+    default = InterferenceGraph()
+    default.build_from_live_ranges(live_ranges)
+    implicit = ImplicitInterferenceGraph()
+    implicit.build_from_live_ranges(live_ranges)
+    assert implicit.edges == default.edges
+    assert implicit.edge_count() == default.edge_count()
+    for name in default.variables:
+        assert implicit.degree(name) == default.degree(name)
+        assert set(implicit.neighbors(name)) == default.variables[name].interferences
+
+def test_implicit_graph_degrees_follow_updates():
+    graph = ImplicitInterferenceGraph()
+    graph.build_from_live_ranges([("a", 0, 10), ("b", 5, 15), ("c", 12, 20)])
+    assert [graph.degree(name) for name in "abc"] == [1, 2, 1]
+    graph.remove_interference("a", "b")
+    assert not graph.interferes("a", "b") and graph.degree("b") == 1
+    graph.add_variable("d", 0, 20)
+    assert [graph.degree(name) for name in "abcd"] == [1, 2, 2, 3]
+    graph.update_range("a", 16, 18)
+    assert graph.interferes("a", "c") and not graph.interferes("a", "b")
+    assert graph.degree("b") == 2 and graph.edge_count() == 5
+    graph.add_interference("a", "b")
+    assert graph.edge_count() == 5
+
+def test_implicit_graph_runs_handlers():
+    graph = ImplicitInterferenceGraph()
+    graph.build_from_live_ranges([("a", 0, 10), ("b", 5, 15), ("c", 20, 30)])
+    coloring = GraphColoring(graph, 2)
+    success, spill_candidates = coloring.color_graph()
+    assert success and not spill_candidates
+    assert coloring.colors["a"] != coloring.colors["b"]
+
+    assert CoalesceHandler(graph).coalesce_variables("a", "c")
+    assert "c" not in graph.variables
+    assert graph.degree("a") == 1
+
+    SpillHandler(graph).handle_spills({"a"})
+    assert graph.variables["a"].spilled
+    assert graph.degree("b") == 0
+    assert graph.edge_count() == 0
+
+@pytest.mark.parametrize("mode", ALLOCATION_MODES)
+def test_register_allocator_implicit_backend(mode):
+    live_ranges = random_live_ranges(80, seed=18)
+    default = RegisterAllocator(4, mode=mode)
+    default.initialize(live_ranges)
+    implicit = RegisterAllocator(4, backend="implicit", mode=mode)
+    implicit.initialize(live_ranges)
+    allocation = implicit.allocate_registers()
+    expected = default.allocate_registers()
+    if mode == "coloring":
+        # Neighbor order differs, so colors and ties between spill
+        # candidates may too
+        assert_no_overlapping_registers(live_ranges, allocation, 4)
+        assert list(allocation.values()).count('spilled') == list(expected.values()).count('spilled')
+    else:
+        assert allocation == expected
+
+# =========================
+# Tests for IntervalIndex
+# =========================
+
+def test_interval_index_matches_brute_force():
+    rng = random.Random(5)
+    index = IntervalIndex()
+    ranges = {}
+    for step in range(600):
+        name = f"v{rng.randrange(150)}"
+        if name in ranges and rng.random() < 0.3:
+            index.remove(name)
+            del ranges[name]
+        else:
+            start = rng.randint(0, 300)
+            ranges[name] = (start, start + rng.randint(0, 25))
+            index.insert(name, *ranges[name])
+        if step % 50 == 0:
+            lo = rng.randint(0, 300)
+            hi = lo + rng.randint(0, 20)
+            expected = {n for n, (s, e) in ranges.items() if s <= hi and e >= lo}
+            assert set(index.overlap(lo, hi)) == expected
+            assert set(index.stab(lo)) == {n for n, (s, e) in ranges.items() if s <= lo <= e}
+    assert len(index) == len(ranges)
+
+def test_graph_index_follows_split_coalesce_and_spill():
+    graph = InterferenceGraph()
+    graph.build_from_live_ranges([("x", 0, 20), ("y", 16, 18), ("z", 30, 40)])
+    LiveRangeSplitter(graph).split_range("x", 15)
+    assert set(graph.live_at(17)) == {"x_split_15", "y"}
+    assert "y" in graph.variables["x_split_15"].interferences
+
+    assert CoalesceHandler(graph).coalesce_variables("y", "z")
+    assert graph.overlapping(25, 25) == []
+    assert set(graph.overlapping(25, 30)) == {"y"}
+    assert graph.variables["y"].end_point == 40
+
+    SpillHandler(graph).handle_spills({"y"})
+    assert graph.live_at(35) == []
+
+# =========================
+# Tests for CSR interference construction
+# =========================
+
+def random_live_ranges(n, seed, span=500, max_length=40):
+    rng = random.Random(seed)
+    live_ranges = []
+    for i in range(n):
+        start = rng.randint(0, span)
+        live_ranges.append((f"v{i}", start, start + rng.randint(0, max_length)))
+    return live_ranges
+
+def test_build_csr_python_matches_graph():
+    live_ranges = random_live_ranges(300, seed=8)
+    graph = InterferenceGraph()
+    graph.build_from_live_ranges(live_ranges)
+    csr = build_csr(live_ranges, use_numpy=False)
+    assert csr.edges == graph.edges
+    assert list(csr.indptr)[-1] == len(csr.indices) == 2 * graph.edge_count()
+    for name in graph.variables:
+        assert csr.degree(name) == graph.degree(name)
+
+def test_build_csr_numpy_matches_python():
+    pytest.importorskip("numpy")
+    live_ranges = random_live_ranges(300, seed=9) + [("p", 600, 600), ("q", 600, 610)]
+    expected = build_csr(live_ranges, use_numpy=False)
+    csr = build_csr(live_ranges, block_size=7, use_numpy=True)
+    assert list(csr.indptr) == list(expected.indptr)
+    assert list(csr.indices) == list(expected.indices)
+    assert csr.interferes("p", "q")
+
+def test_csr_graph_feeds_graph_coloring():
+    live_ranges = random_live_ranges(200, seed=10)
+    csr = build_csr(live_ranges)
+    coloring = GraphColoring(csr, 3)
+    success, spill_candidates = coloring.color_graph()
+    assert success
+    for name, color in coloring.colors.items():
+        assert all(coloring.colors.get(neighbor) != color for neighbor in csr.neighbors(name))
+
+    SpillHandler(csr).handle_spills(spill_candidates)
+    for name in spill_candidates:
+        assert csr.variables[name].spilled
+        assert csr.degree(name) == 0 and not csr.neighbors(name)
+
+# =========================
+# Tests for graph snapshots
+# =========================
+
+def _snapshot_spills(path, num_registers):
+    return sorted(GraphColoring(load_snapshot(path), num_registers).color_graph()[1])
+
+@pytest.mark.parametrize("graph_class", [InterferenceGraph, CompactInterferenceGraph])
+def test_snapshot_round_trip(graph_class, tmp_path):
+    live_ranges = random_live_ranges(300, seed=25)
+    graph = graph_class()
+    graph.build_from_live_ranges(live_ranges)
+    graph.remove_interference(*next(iter(graph.edges)))
+    path = tmp_path / "f.graph"
+    save_snapshot(graph, path)
+    loaded = load_snapshot(path)
+    assert isinstance(loaded.indices, memoryview)
+    assert loaded.edges == graph.edges and loaded.edge_count() == graph.edge_count()
+    assert loaded.variables["v7"].start_point == graph.variables["v7"].start_point
+    assert all(loaded.degree(name) == graph.degree(name) for name in graph.variables)
+
+    success, spill_candidates = GraphColoring(loaded, 3).color_graph()
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        assert executor.submit(_snapshot_spills, path, 3).result() == sorted(spill_candidates)
+
+@pytest.mark.parametrize("graph_class", [InterferenceGraph, CompactInterferenceGraph])
+def test_snapshot_keeps_lifetime_holes(graph_class, tmp_path):
+    live_ranges = [("x", 0, 30, None, 0, [(0, 5), (20, 30)]), ("y", 8, 15), ("z", 4, 22)]
+    graph = graph_class()
+    graph.build_from_live_ranges(live_ranges)
+    path = tmp_path / "holes.graph"
+    save_snapshot(graph, path)
+    loaded = load_snapshot(path)
+    assert loaded.variables["x"].segments == [(0, 5), (20, 30)]
+    assert loaded.variables["y"].segments == [(8, 15)]
+    assert sorted(loaded.live_at(10)) == ["y", "z"]
+    # x and y share a register across x's hole
+    allocation = {"x": 0, "y": 0, "z": 1}
+    assert verify_allocation(loaded.variables, allocation, 2).ok
+
+def test_snapshot_rejects_other_files(tmp_path):
+    path = tmp_path / "bad.graph"
+    path.write_bytes(b"RALR" + bytes(44))
+    with pytest.raises(ValueError):
+        load_snapshot(path)
+
+def test_snapshot_rejects_truncated_files(tmp_path):
+    graph = InterferenceGraph()
+    graph.build_from_live_ranges(random_live_ranges(50, seed=26))
+    path = tmp_path / "f.graph"
+    save_snapshot(graph, path)
+    data = path.read_bytes()
+    path.write_bytes(data[:len(data) - 40])
+    with pytest.raises(ValueError, match="bytes"):
+        load_snapshot(path)
+    path.write_bytes(data[:20])
+    with pytest.raises(ValueError, match="truncated"):
+        load_snapshot(path)
+
 # =========================
 # Tests for GraphColoring
 # =========================
@@ -64,6 +430,83 @@ def test_color_graph_with_spill():
     assert success
     assert spill_candidates
 
+def test_color_graph_updates_degrees_on_removal():
+    graph = InterferenceGraph()
+    live_ranges = [("a", 0, 10), ("b", 5, 15), ("c", 10, 20), ("d", 15, 25)]
+    graph.build_from_live_ranges(live_ranges)
+    coloring = GraphColoring(graph, 2)
+    success, spill_candidates = coloring.color_graph()
+    # Spilling one of the two middle ranges leaves a colorable chain
+    assert success
+    assert len(spill_candidates) == 1
+    assert spill_candidates <= {"b", "c"}
+    assert set(coloring.colors) == {"a", "b", "c", "d"} - spill_candidates
+
+def test_color_graph_large_interval_graph():
+    rng = random.Random(3)
+    live_ranges = []
+    for i in range(2000):
+        start = rng.randint(0, 5000)
+        live_ranges.append((f"v{i}", start, start + rng.randint(0, 30)))
+    graph = InterferenceGraph()
+    graph.build_from_live_ranges(live_ranges)
+    coloring = GraphColoring(graph, 4)
+    success, spill_candidates = coloring.color_graph()
+    assert success
+    for name, color in coloring.colors.items():
+        for neighbor in graph.neighbors(name):
+            assert coloring.colors.get(neighbor) != color
+
+# =========================
+# Tests for component decomposition
+# =========================
+
+def test_connected_components_matches_search():
+    live_ranges = random_live_ranges(300, seed=19, span=3000, max_length=15)
+    graph = InterferenceGraph()
+    graph.build_from_live_ranges(live_ranges)
+    components = connected_components(graph)
+    assert sorted(name for component in components for name in component) == sorted(graph.variables)
+    component_of = {name: i for i, component in enumerate(components) for name in component}
+    for name in graph.variables:
+        assert all(component_of[neighbor] == component_of[name]
+                   for neighbor in graph.neighbors(name))
+    # Every component is connected
+    for component in components:
+        seen = {component[0]}
+        frontier = [component[0]]
+        while frontier:
+            for neighbor in graph.neighbors(frontier.pop()):
+                if neighbor not in seen:
+                    seen.add(neighbor)
+                    frontier.append(neighbor)
+        assert seen == set(component)
+
+@pytest.mark.parametrize("max_workers", [0, 2])
+def test_color_components_valid_and_counted(max_workers):
+    live_ranges = random_live_ranges(400, seed=20, span=2000, max_length=30)
+    graph = InterferenceGraph()
+    graph.build_from_live_ranges(live_ranges)
+    instrumentation = Instrumentation()
+    coloring = GraphColoring(graph, 3, instrumentation)
+    success, spill_candidates = color_components(coloring, max_workers, chunk_nodes=50)
+    assert success
+    assert set(coloring.colors) == set(graph.variables) - spill_candidates
+    for name, color in coloring.colors.items():
+        assert 0 <= color < 3
+        assert all(coloring.colors.get(neighbor) != color for neighbor in graph.neighbors(name))
+    assert instrumentation.stats["components"] == len(connected_components(graph))
+    assert instrumentation.stats["trivial_components"] > 0
+
+def test_register_allocator_decompose():
+    live_ranges = random_live_ranges(200, seed=21, span=1500)
+    allocator = RegisterAllocator(3, mode="coloring", decompose=True)
+    allocator.initialize(live_ranges)
+    allocation = allocator.allocate_registers()
+    assert_no_overlapping_registers(live_ranges, allocation, 3)
+    assert set(allocator.spill_slots) == {name for name, reg in allocation.items()
+                                          if reg == 'spilled'}
+
 # =========================
 # Tests for SpillHandler
 # =========================
@@ -78,6 +521,35 @@ def test_handle_spills():
     assert "b" not in graph.variables["a"].interferences
     assert "a" not in graph.variables["b"].interferences
 
+@pytest.mark.parametrize("graph_class", [InterferenceGraph, CompactInterferenceGraph,
+                                         ImplicitInterferenceGraph])
+def test_handle_spills_batch_with_spilled_neighbors(graph_class):
+    live_ranges = random_live_ranges(200, seed=16)
+    spilled = {name for name, *_ in live_ranges[::3]}
+    graph = graph_class()
+    graph.build_from_live_ranges(live_ranges)
+    expected = {edge for edge in graph.edges if edge[0] not in spilled and edge[1] not in spilled}
+    SpillHandler(graph).handle_spills(spilled)
+    assert set(graph.edges) == expected
+    assert graph.edge_count() == len(expected) // 2
+    assert all(graph.degree(name) == 0 for name in spilled)
+
+    csr = build_csr(live_ranges, use_numpy=False)
+    SpillHandler(csr).handle_spills(spilled)
+    assert set(csr.edges) == expected and csr.edge_count() == len(expected) // 2
+
+def test_assign_spill_slots_shares_disjoint_ranges():
+    graph = InterferenceGraph()
+    graph.build_from_live_ranges(random_live_ranges(300, seed=17))
+    spill_handler = SpillHandler(graph)
+    spilled = list(graph.variables)[::2]
+    slots = spill_handler.assign_spill_slots(spilled)
+    ranges = [(name, graph.variables[name].start_point, graph.variables[name].end_point)
+              for name in spilled]
+    num_slots = len(set(slots.values()))
+    assert num_slots == pressure_profile(ranges).max_live < len(spilled)
+    assert_no_overlapping_registers(ranges, slots, num_slots)
+
 # =========================
 # Tests for CoalesceHandler
 # =========================
@@ -98,6 +570,67 @@ def test_coalesce_variables():
     assert "b" not in graph.variables
     assert graph.variables["a"].end_point == 20
 
+@pytest.mark.parametrize("graph_class", [InterferenceGraph, CompactInterferenceGraph])
+def test_coalesce_moves_merges_touching_copy(graph_class):
+    # b = a at point 5: a dies where b is born
+    graph = graph_class()
+    graph.build_from_live_ranges([("a", 0, 5), ("b", 5, 9), ("c", 5, 7), ("t", 3, 6)])
+    coalesce_handler = CoalesceHandler(graph)
+    assert graph.interferes("a", "b") and coalesce_handler.can_coalesce("a", "b")
+    assert coalesce_handler.coalesce_moves([("a", "b")], 4) == [("a", "b")]
+    assert "b" not in graph.variables
+    assert graph.variables["a"].segments == [(0, 9)]
+    assert not graph.interferes("a", "a")
+    assert set(graph.neighbors("a")) == {"c", "t"}
+    # A copy whose ends truly overlap is still left alone
+    assert coalesce_handler.coalesce_moves([("a", "c")], 4) == []
+
+def test_coalesce_moves_merges_copy_chain():
+    graph = InterferenceGraph()
+    graph.build_from_live_ranges([("a", 0, 4), ("b", 5, 9), ("c", 10, 14), ("t", 3, 6)])
+    coalesce_handler = CoalesceHandler(graph)
+    coalesced = coalesce_handler.coalesce_moves([("a", "b"), ("b", "c")], 2)
+    assert len(coalesced) == 2
+    assert len({coalesce_handler.find(name) for name in "abc"}) == 1
+    root = coalesce_handler.find("a")
+    assert graph.interferes(root, "t")
+
+    coloring = GraphColoring(graph, 2)
+    success, spill_candidates = coloring.color_graph()
+    assert success and not spill_candidates
+    allocation = coalesce_handler.expand_allocation(coloring.colors)
+    assert allocation["a"] == allocation["b"] == allocation["c"] != allocation["t"]
+
+def test_coalesce_moves_is_conservative():
+    # Merging u and v would close the triangle u/v-a-b, which 2 registers cannot color
+    graph = InterferenceGraph()
+    for name in ("u", "v", "a", "b"):
+        graph.add_variable(name, 0, 1)
+    graph.add_interference("u", "a")
+    graph.add_interference("v", "b")
+    graph.add_interference("a", "b")
+    coalesce_handler = CoalesceHandler(graph)
+    assert coalesce_handler.coalesce_moves([("u", "v")], 2) == []
+    assert "u" in graph.variables and "v" in graph.variables
+    # With a third register the merge is safe
+    assert coalesce_handler.coalesce_moves([("u", "v")], 3) == [("u", "v")]
+
+def test_coalesce_moves_skips_interfering_pairs():
+    graph = InterferenceGraph()
+    graph.build_from_live_ranges([("a", 0, 10), ("b", 5, 15)])
+    assert CoalesceHandler(graph).coalesce_moves([("a", "b")], 4) == []
+
+def test_coalesce_keeps_lifetime_hole():
+    graph = InterferenceGraph()
+    graph.build_from_live_ranges([("a", 0, 5), ("b", 20, 30), ("c", 8, 12),
+                                  ("d", 0, 28, None, 0, [(0, 2), (25, 28)])])
+    handler = CoalesceHandler(graph)
+    assert handler.coalesce_variables("a", "b")
+    assert graph.variables["a"].segments == [(0, 5), (20, 30)]
+    assert graph.neighbors("a") == {"d"}
+    # c sits entirely in the hole, so it can join a as well
+    assert handler.can_coalesce("a", "c")
+
 # =========================
 # Tests for LiveRangeSplitter
 # =========================
@@ -120,6 +653,61 @@ def test_split_range_fail():
     new_var_name, success = splitter.split_range("x", 5)  # within range, should succeed
     assert success
 
+def test_split_range_drops_stale_edges():
+    graph = InterferenceGraph()
+    graph.build_from_live_ranges([("x", 0, 20), ("y", 2, 4), ("z", 17, 19)])
+    LiveRangeSplitter(graph).split_range("x", 15)
+    assert graph.neighbors("x") == {"y"}
+    assert graph.neighbors("x_split_15") == {"z"}
+
+def test_split_range_in_lifetime_hole():
+    graph = InterferenceGraph()
+    graph.build_from_live_ranges([("x", 0, 30, None, 0, [(0, 5), (20, 30)]), ("y", 22, 25)])
+    new_var, success = LiveRangeSplitter(graph).split_range("x", 10)
+    assert success and new_var == "x_split_10"
+    assert (graph.variables["x"].start_point, graph.variables["x"].end_point) == (0, 5)
+    assert graph.variables[new_var].segments == [(20, 30)]
+    assert graph.neighbors("x") == set() and graph.neighbors(new_var) == {"y"}
+
+def test_split_for_pressure_isolates_hot_region():
+    live_ranges = [("x", 0, 100, 4, 1), ("y", 40, 50), ("z", 40, 50), ("w", 60, 70)]
+    graph = InterferenceGraph()
+    graph.build_from_live_ranges(live_ranges)
+    pieces, spill_candidates = LiveRangeSplitter(graph).split_for_pressure(2)
+    assert pieces == {"x": ["x", "x_split_40", "x_split_51"]}
+    assert spill_candidates == {"x_split_40"}
+    ranges = [(name, var.start_point, var.end_point) for name, var in graph.variables.items()]
+    assert ("x_split_40", 40, 50) in ranges and ("x", 0, 39) in ranges
+    assert graph.variables["x_split_51"].loop_depth == 1
+    # Interferences were updated incrementally, matching a fresh build
+    rebuilt = InterferenceGraph()
+    rebuilt.build_from_live_ranges(ranges)
+    assert graph.edges == rebuilt.edges
+
+    allocator = RegisterAllocator(2, mode="linear_scan", auto_split=True)
+    allocator.initialize(live_ranges)
+    allocation = allocator.allocate_registers()
+    assert [name for name, reg in allocation.items() if reg == 'spilled'] == ["x_split_40"]
+    assert allocator.spills_avoided == 1
+
+@pytest.mark.parametrize("mode", ["linear_scan", "coloring"])
+def test_auto_split_reduces_spill_traffic(mode):
+    live_ranges = benchmark.loop_heavy(400, seed=3)
+    # Splitting starts from the ranges linear scan would spill whole
+    whole = RegisterAllocator(4, mode="linear_scan")
+    whole.initialize(live_ranges)
+    whole.allocate_registers()
+    allocator = RegisterAllocator(4, mode=mode, auto_split=True)
+    allocator.initialize(live_ranges)
+    allocation = allocator.allocate_registers()
+    variables = allocator.interference_graph.variables
+    assert set(allocation) == set(variables)
+    assert allocator.split_pieces and allocator.spills_avoided > 0
+    assert allocator.spill_traffic['loads'] < whole.spill_traffic['loads']
+    assert_no_overlapping_registers(
+        [(name, var.start_point, var.end_point) for name, var in variables.items()],
+        allocation, 4)
+
 # =========================
 # Tests for RegisterAllocator
 # =========================
@@ -144,6 +732,373 @@ def test_register_allocator_allocate_registers():
         if reg != 'spilled':
             assert 0 <= reg < 2
 
+def assert_no_overlapping_registers(live_ranges, allocation, num_registers):
+    for i, (name1, start1, end1) in enumerate(live_ranges):
+        reg = allocation[name1]
+        if reg == 'spilled':
+            continue
+        assert 0 <= reg < num_registers
+        for name2, start2, end2 in live_ranges[i + 1:]:
+            if not (end1 < start2 or end2 < start1):
+                assert allocation[name2] != reg, (name1, name2)
+
+def test_linear_scan_allocate_registers():
+    allocator = RegisterAllocator(2, mode="linear_scan")
+    live_ranges = [("x", 0, 10), ("y", 5, 15), ("z", 12, 20)]
+    allocator.initialize(live_ranges)
+    allocation = allocator.allocate_registers()
+    assert 'spilled' not in allocation.values()
+    assert allocation["x"] != allocation["y"]
+    assert allocation["y"] != allocation["z"]
+
+def test_linear_scan_spills_furthest_end():
+    allocator = RegisterAllocator(2, mode="linear_scan")
+    live_ranges = [("long", 0, 100), ("a", 1, 10), ("b", 2, 12), ("c", 20, 30)]
+    allocator.initialize(live_ranges)
+    allocation = allocator.allocate_registers()
+    assert allocation["long"] == 'spilled'
+    assert allocation["a"] != 'spilled' and allocation["b"] != 'spilled'
+    assert allocation["c"] != 'spilled'
+
+def test_linear_scan_never_shares_registers():
+    rng = random.Random(11)
+    live_ranges = []
+    for i in range(300):
+        start = rng.randint(0, 1000)
+        live_ranges.append((f"v{i}", start, start + rng.randint(0, 60)))
+    allocator = RegisterAllocator(5, mode="linear_scan")
+    allocator.initialize(live_ranges)
+    allocation = allocator.allocate_registers()
+    assert set(allocation) == {name for name, _, _ in live_ranges}
+    assert_no_overlapping_registers(live_ranges, allocation, 5)
+
+# =========================
+# Tests for the allocation verifier
+# =========================
+
+@pytest.mark.parametrize("strict", [False, True])
+def test_verifier_matches_brute_force(strict):
+    rng = random.Random(26)
+    live_ranges = random_live_ranges(300, seed=26)
+    allocation = {name: rng.randrange(6) for name, *_ in live_ranges}
+    expected = set()
+    for i, (name1, start1, end1) in enumerate(live_ranges):
+        for name2, start2, end2 in live_ranges[i + 1:]:
+            if strict:
+                overlap = start1 < end2 and start2 < end1
+            else:
+                overlap = start1 <= end2 and start2 <= end1
+            if overlap and allocation[name1] == allocation[name2]:
+                expected.add(frozenset((name1, name2)))
+    report = verify_allocation(live_ranges, allocation, 6, strict=strict)
+    assert {frozenset(conflict[:2]) for conflict in report.conflicts} == expected
+    assert not report.out_of_range and not report.unassigned
+
+def test_verifier_reports_each_problem_kind():
+    live_ranges = [("a", 0, 10), ("b", 5, 15), ("c", 20, 30, None, 0, [(20, 22), (28, 30)]),
+                   ("d", 23, 27), ("e", 40, 50)]
+    report = verify_allocation(live_ranges, {"a": 0, "b": 0, "c": 1, "d": 1, "x": 0}, 1)
+    assert report.conflicts == [("a", "b", 0)]
+    assert report.out_of_range == [("c", 1), ("d", 1)]
+    assert report.unassigned == ["e"]
+    assert report.unknown == ["x"]
+    assert not report.ok
+
+def test_verifier_accepts_allocator_outputs():
+    live_ranges = random_live_ranges(100, seed=27)
+    naive = NaiveAllocator(4).allocate_registers(live_ranges)
+    assert verify_allocation(live_ranges, naive, 4).ok == (not any(
+        start1 <= end2 and start2 <= end1
+        for name1, start1, end1 in live_ranges for name2, start2, end2 in live_ranges
+        if name1 < name2 and naive[name1] == naive[name2] != 'spilled'))
+
+    graph = InterferenceGraph()
+    graph.build_from_live_ranges(live_ranges)
+    coloring = GraphColoring(graph, 4)
+    success, spill_candidates = coloring.color_graph()
+    assert verify_allocation(graph.variables, coloring.colors, 4, spilled=spill_candidates).ok
+
+    for mode in ALLOCATION_MODES:
+        allocator = RegisterAllocator(4, mode=mode, verify=True)
+        allocator.initialize(live_ranges)
+        allocator.allocate_registers()
+        assert allocator.verification.ok
+
+def test_repair_conflicts_uses_free_register():
+    allocator = RegisterAllocator(2)
+    allocator.initialize([("a", 0, 10), ("b", 5, 15), ("c", 12, 20), ("d", 30, 40)])
+    allocation = allocator._repair_conflicts({"a": 0, "b": 0, "c": 1, "d": 1})
+    # b cannot take register 1 (c overlaps it), so it is spilled instead
+    assert allocation == {"a": 0, "b": 'spilled', "c": 1, "d": 1}
+    allocation = allocator._repair_conflicts({"a": 0, "b": 0, "c": 0, "d": 1})
+    assert verify_allocation(allocator.interference_graph.variables, allocation, 2,
+                             strict=True).ok
+
+# =========================
+# Tests for lifetime holes
+# =========================
+
+@pytest.mark.parametrize("mode", ["timeline", "coloring"])
+def test_allocator_reuses_lifetime_holes(mode):
+    live_ranges = [("x", 0, 30, None, 0, [(0, 5), (20, 30)]), ("y", 8, 15), ("z", 16, 18)]
+    allocator = RegisterAllocator(1, mode=mode)
+    allocator.initialize(live_ranges)
+    assert allocator.allocate_registers() == {"x": 0, "y": 0, "z": 0}
+
+# =========================
+# Tests for incremental re-allocation
+# =========================
+
+@pytest.mark.parametrize("backend", ["default", "compact", "implicit"])
+@pytest.mark.parametrize("mode", ["timeline", "linear_scan", "coloring"])
+def test_reallocate_small_edits_stay_valid(mode, backend):
+    rng = random.Random(22)
+    live_ranges = {name: (name, start, end)
+                   for name, start, end in random_live_ranges(150, seed=22)}
+    allocator = RegisterAllocator(4, backend=backend, mode=mode)
+    allocator.initialize(live_ranges.values())
+    allocation = allocator.allocate_registers()
+    for step in range(10):
+        name = rng.choice(sorted(live_ranges))
+        start = rng.randint(0, 500)
+        change = (name, start, start + rng.randint(0, 40))
+        new_name = f"t{step}"
+        live_ranges[name] = change
+        live_ranges[new_name] = (new_name, start, start + 5)
+        removed = rng.choice(sorted(set(live_ranges) - {name, new_name}))
+        del live_ranges[removed]
+        previous = dict(allocation)
+        allocation = allocator.reallocate(added=[live_ranges[new_name]], removed=[removed],
+                                          resized=[change])
+        assert set(allocation) == set(live_ranges)
+        if mode == "timeline":
+            # The timeline pass lets ranges that only touch share a register
+            ranges = list(live_ranges.values())
+            for i, (name1, start1, end1) in enumerate(ranges):
+                for name2, start2, end2 in ranges[i + 1:]:
+                    if start1 < end2 and start2 < end1 and allocation[name1] != 'spilled':
+                        assert allocation[name1] != allocation[name2], (name1, name2)
+        else:
+            assert_no_overlapping_registers(list(live_ranges.values()), allocation, 4)
+        # Untouched variables keep their register unless a neighbor moved them
+        moved = {var for var in allocation if var in previous and allocation[var] != previous[var]
+                 and previous[var] != 'spilled'}
+        assert len(moved) <= 2
+    spilled = [var for var, reg in allocation.items() if reg == 'spilled']
+    assert set(allocator.spill_slots) == set(spilled)
+    # Traffic and slots are kept up to date incrementally
+    variables = allocator.interference_graph.variables
+    assert allocator.spill_traffic == estimate_spill_traffic(variables, spilled)
+    slots = allocator.spill_slots
+    for i, name1 in enumerate(spilled):
+        for name2 in spilled[i + 1:]:
+            var1, var2 = variables[name1], variables[name2]
+            if var1.start_point <= var2.end_point and var2.start_point <= var1.end_point:
+                assert slots[name1] != slots[name2]
+
+def test_reallocate_unspills_after_removal():
+    allocator = RegisterAllocator(1, mode="coloring")
+    allocator.initialize([("x", 0, 10), ("y", 5, 15)])
+    allocation = allocator.allocate_registers()
+    spilled = next(name for name, reg in allocation.items() if reg == 'spilled')
+    kept = "x" if spilled == "y" else "y"
+    assert allocator.reallocate(removed=[kept]) == {spilled: 0}
+    assert allocator.interference_graph.variables[spilled].spilled is False
+
+def test_reallocate_returns_same_view_on_both_paths():
+    live_ranges = random_live_ranges(40, seed=25)
+    allocator = RegisterAllocator(3, mode="linear_scan")
+    assert allocator.allocation is None
+    allocator.initialize(live_ranges)
+    allocator.allocate_registers()
+    small = allocator.reallocate(added=[("n", 3, 9)])
+    large = allocator.reallocate(resized=[(name, start + 1, end + 1)
+                                          for name, start, end in live_ranges[:20]])
+    assert small is large is allocator.allocation
+    with pytest.raises(TypeError):
+        small["n"] = 0
+
+def test_reallocate_large_delta_runs_from_scratch():
+    live_ranges = random_live_ranges(40, seed=23)
+    allocator = RegisterAllocator(3)
+    allocator.initialize(live_ranges)
+    allocator.allocate_registers()
+    shifted = [(name, start + 1, end + 1) for name, start, end in live_ranges[:20]]
+    allocation = allocator.reallocate(resized=shifted)
+    cold = RegisterAllocator(3)
+    cold.initialize(shifted + live_ranges[20:])
+    assert allocation == cold.allocate_registers()
+    with pytest.raises(ValueError):
+        RegisterAllocator(3).reallocate(removed=["x"])
+
+# =========================
+# Tests for greedy allocation
+# =========================
+
+def test_greedy_evicts_and_splits_long_range():
+    allocator = RegisterAllocator(1, mode="greedy")
+    allocator.initialize([("x", 0, 100, 3, 0), ("y", 40, 50, 2, 1)])
+    allocation = allocator.allocate_registers()
+    # y is denser, so it evicts x, which then keeps its register outside y
+    assert allocation == {"x": 0, "x_split_40": 'spilled', "x_split_51": 0, "y": 0}
+    assert allocator.split_pieces == {"x": ["x", "x_split_40", "x_split_51"]}
+
+def test_greedy_valid_and_cuts_weighted_spill_traffic():
+    # Uses and loop depths vary widely; with unit weights linear scan's
+    # furthest-end rule already spills the fewest ranges
+    rng = random.Random(24)
+    live_ranges = [(name, start, end, rng.randint(1, 6), rng.randint(0, 2))
+                   for name, start, end in random_live_ranges(300, seed=24)]
+    traffic = {}
+    for mode in ("linear_scan", "greedy"):
+        allocator = RegisterAllocator(4, mode=mode)
+        allocator.initialize(live_ranges)
+        allocation = allocator.allocate_registers()
+        ranges = [(name, var.start_point, var.end_point)
+                  for name, var in allocator.interference_graph.variables.items()]
+        assert_no_overlapping_registers(ranges, allocation, 4)
+        traffic[mode] = allocator.spill_traffic['loads'] + allocator.spill_traffic['stores']
+    assert traffic["greedy"] < traffic["linear_scan"]
+
+# =========================
+# Tests for the spill-cost model
+# =========================
+
+# "cold" is live across the whole loop but read once; "i" and "acc" are hot
+# loop variables. With two registers one of the three has to go.
+WEIGHTED_LOOP = [("cold", 0, 100, 1, 0), ("i", 10, 90, 20, 2), ("acc", 10, 90, 20, 2)]
+
+def test_color_graph_spills_cheapest_per_degree():
+    graph = InterferenceGraph()
+    graph.build_from_live_ranges(WEIGHTED_LOOP)
+    coloring = GraphColoring(graph, 2)
+    success, spill_candidates = coloring.color_graph()
+    assert success
+    assert spill_candidates == {"cold"}
+    assert coloring.spill_traffic == {'loads': 1, 'stores': 1}
+
+def test_timeline_evicts_cold_range_for_hot_one():
+    allocator = RegisterAllocator(2)
+    allocator.initialize(WEIGHTED_LOOP)
+    allocation = allocator.allocate_registers()
+    assert allocation["cold"] == 'spilled'
+    assert allocation["i"] != allocation["acc"]
+    assert 'spilled' not in (allocation["i"], allocation["acc"])
+    assert allocator.spill_traffic == {'loads': 1, 'stores': 1}
+
+def test_weighted_allocation_independent_of_hash_seed():
+    script = ("import json, benchmark\n"
+              "from main import ALLOCATION_MODES, RegisterAllocator\n"
+              "results = {}\n"
+              "for mode in ALLOCATION_MODES:\n"
+              "    allocator = RegisterAllocator(4, mode=mode)\n"
+              "    allocator.initialize(benchmark.loop_heavy(300))\n"
+              "    results[mode] = allocator.allocate_registers()\n"
+              "print(json.dumps(results, sort_keys=True))\n")
+    outputs = set()
+    for seed in ("1", "2"):
+        env = dict(os.environ, PYTHONHASHSEED=seed)
+        outputs.add(subprocess.run([sys.executable, "-c", script], env=env, check=True,
+                                   capture_output=True, text=True,
+                                   cwd=os.path.dirname(os.path.abspath(__file__))).stdout)
+    assert len(outputs) == 1
+
+def test_spill_traffic_reported_per_mode():
+    for mode in ALLOCATION_MODES:
+        allocator = RegisterAllocator(1, mode=mode)
+        allocator.initialize([("a", 0, 10, 3, 1), ("b", 5, 15)])
+        allocation = allocator.allocate_registers()
+        spilled = [name for name, reg in allocation.items() if reg == 'spilled']
+        assert len(spilled) == 1
+        expected = {'loads': 30, 'stores': 10} if spilled == ["a"] else {'loads': 1, 'stores': 1}
+        assert allocator.spill_traffic == expected
+
+# =========================
+# Tests for pressure analysis
+# =========================
+
+def test_pressure_profile_max_live_and_regions():
+    live_ranges = [("a", 0, 10), ("b", 5, 15), ("c", 10, 20), ("d", 30, 32)]
+    profile = pressure_profile(live_ranges)
+    assert profile.max_live == 3
+    assert profile.pressure_at(10) == 3 and profile.pressure_at(11) == 2
+    assert profile.pressure_at(25) == 0
+    assert profile.excess_regions(2) == [(10, 10)]
+    assert profile.excess_regions(1) == [(5, 15)]
+    [(region, names)] = profile.peak_variables()
+    assert region == (10, 10) and sorted(names) == ["a", "b", "c"]
+    assert profile.min_spills(2) == 1 and profile.fits(3)
+
+@pytest.mark.parametrize("use_numpy", [False, True])
+def test_pressure_profile_skips_lifetime_holes(use_numpy):
+    if use_numpy:
+        pytest.importorskip("numpy")
+    live_ranges = [("a", 0, 100, None, 0, [(0, 10), (90, 100)]), ("b", 20, 30), ("c", 20, 30)]
+    profile = pressure_profile(live_ranges, use_numpy=use_numpy)
+    assert profile.max_live == 2 and profile.min_spills(2) == 0
+    assert profile.pressure_at(50) == 0 and profile.pressure_at(95) == 1
+    assert sorted(profile.live_at(25)) == ["b", "c"]
+    assert profile.live_at(95) == ["a"]
+
+def test_peak_variables_split_where_live_set_changes():
+    profile = pressure_profile([("a", 0, 10), ("b", 0, 20), ("d", 11, 20)])
+    assert profile.peaks() == [(0, 20)]
+    assert profile.peak_variables() == [((0, 10), ["a", "b"]), ((11, 20), ["b", "d"])]
+
+def test_pressure_max_live_matches_coloring():
+    live_ranges = random_live_ranges(400, seed=12)
+    profile = pressure_profile(live_ranges)
+    # An interval graph needs exactly MaxLive colors
+    graph = InterferenceGraph()
+    graph.build_from_live_ranges(live_ranges)
+    coloring = GraphColoring(graph, profile.max_live)
+    assert coloring.color_graph() == (True, set())
+    graph = InterferenceGraph()
+    graph.build_from_live_ranges(live_ranges)
+    assert GraphColoring(graph, profile.max_live - 1).color_graph()[1]
+
+def test_pressure_profile_numpy_matches_python():
+    pytest.importorskip("numpy")
+    live_ranges = random_live_ranges(500, seed=13)
+    expected = pressure_profile(live_ranges, use_numpy=False)
+    profile = pressure_profile(live_ranges, use_numpy=True)
+    assert profile.points == expected.points
+    assert profile.pressures == expected.pressures
+
+# =========================
+# Tests for instrumentation
+# =========================
+
+def test_instrumentation_collects_phases_and_counters():
+    events = []
+    instrumentation = Instrumentation(sinks=[lambda kind, name, value: events.append((kind, name))])
+    allocator = RegisterAllocator(2, mode="coloring", instrumentation=instrumentation)
+    allocator.initialize([("a", 0, 10), ("b", 5, 15), ("c", 10, 20), ("d", 15, 25)])
+    allocator.allocate_registers()
+
+    stats = allocator.stats
+    assert set(stats.phase_ns) == {"build", "color", "spill"}
+    assert stats["nodes"] == 4 and stats["edges"] == 5
+    assert stats["simplify_iterations"] == 4
+    assert stats["spill_candidates"] == 1 == stats["spilled_variables"]
+    assert ("phase", "color") in events and ("count", "edges") in events
+    assert stats.as_dict()["counters"]["spill_edges_removed"] == 3
+
+def test_instrumentation_timeline_phases():
+    instrumentation = Instrumentation()
+    allocator = RegisterAllocator(2, instrumentation=instrumentation)
+    allocator.initialize([("x", 0, 10), ("y", 5, 15), ("z", 12, 20)])
+    allocator.allocate_registers()
+    assert {"build", "timeline", "post_pass"} <= set(allocator.stats.phase_ns)
+    assert allocator.stats["post_pass_reassignments"] == 0
+
+def test_instrumentation_off_by_default():
+    allocator = RegisterAllocator(2)
+    assert allocator.instrumentation is NULL_INSTRUMENTATION
+    assert allocator.stats is None
+    with NULL_INSTRUMENTATION.phase("anything"):
+        NULL_INSTRUMENTATION.count("anything")
+
 # =========================
 # Tests for visualize_allocation utility
 # =========================
@@ -228,6 +1183,246 @@ def test_allocator_performance(test_live_ranges, num_registers):
     print("============================")
     visualize_allocation(naive_allocation, num_registers)
 
+# =========================
+# Tests for batch allocation
+# =========================
+
+def test_chunk_jobs_groups_small_functions():
+    jobs = [(i, [("x", 0, 1), ("y", 1, 2)], 2) for i in range(5)]
+    chunks = list(batch.chunk_jobs(jobs, chunk_ranges=4))
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+
+def test_allocate_batch_matches_serial():
+    jobs = [(f"f{i}", benchmark.short_temporaries(60, seed=i), 3 + i % 3) for i in range(12)]
+    serial = {function_id: batch.allocate_function(live_ranges, num_registers)
+              for function_id, live_ranges, num_registers in jobs}
+    parallel = dict(batch.allocate_batch(jobs, max_workers=2, chunk_ranges=100))
+    assert parallel == serial
+    assert dict(batch.allocate_batch(iter(jobs), max_workers=0, mode="timeline")) == serial
+
+# =========================
+# Tests for the allocation cache
+# =========================
+
+def test_cache_hits_alpha_equivalent_functions():
+    cache = AllocationCache(max_entries=8)
+    first = CachingRegisterAllocator(2, cache=cache, mode="linear_scan")
+    first.initialize([("x", 0, 10), ("y", 5, 15), ("z", 12, 20)])
+    cold = first.allocate_registers()
+
+    renamed = CachingRegisterAllocator(2, cache=cache, mode="linear_scan")
+    renamed.initialize([("a", 100, 110), ("b", 105, 115), ("c", 112, 120)])
+    warm = renamed.allocate_registers()
+
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+    assert warm == {"a": cold["x"], "b": cold["y"], "c": cold["z"]}
+
+    reference = RegisterAllocator(2, mode="linear_scan")
+    reference.initialize([("x", 0, 10), ("y", 5, 15), ("z", 12, 20)])
+    assert cold == reference.allocate_registers()
+
+def cold_allocation(live_ranges, num_registers, mode):
+    allocator = RegisterAllocator(num_registers, mode=mode)
+    allocator.initialize(live_ranges)
+    return allocator.allocate_registers()
+
+@pytest.mark.parametrize("mode", ALLOCATION_MODES)
+def test_cache_matches_cold_run(mode):
+    cache = AllocationCache()
+    # Equal ranges: the allocators fall back on name order
+    for live_ranges in ([("b", 0, 10), ("a", 0, 10)], [("d", 5, 15), ("c", 5, 15)],
+                        [("a", 0, 10), ("b", 0, 10)]):
+        allocator = CachingRegisterAllocator(1, cache=cache, mode=mode)
+        allocator.initialize(live_ranges)
+        assert allocator.allocate_registers() == cold_allocation(live_ranges, 1, mode)
+    assert cache.hits == 1 and cache.misses == 2
+
+    live_ranges = random_live_ranges(60, seed=3)
+    shifted = [(name.upper(), start + 7, end + 7) for name, start, end in live_ranges]
+    for function in (live_ranges, shifted):
+        allocator = CachingRegisterAllocator(4, cache=cache, mode=mode)
+        allocator.initialize(function)
+        assert allocator.allocate_registers() == cold_allocation(function, 4, mode)
+    assert cache.hits == 2
+
+    # Weighted ranges, where priority ties between equal costs are common
+    for seed in range(5):
+        weighted = benchmark.loop_heavy(300, seed)
+        renamed = [(f"f_{name}", start + 1000, end + 1000, *weights)
+                   for name, start, end, *weights in weighted]
+        for function in (weighted, renamed):
+            allocator = CachingRegisterAllocator(4, cache=cache, mode=mode)
+            allocator.initialize(function)
+            assert allocator.allocate_registers() == cold_allocation(function, 4, mode)
+    assert cache.hits == 7
+
+@pytest.mark.parametrize("mode", ALLOCATION_MODES)
+def test_cached_allocations_verify(mode):
+    cache = AllocationCache()
+    # Greedy splits x around y and z; the spilled piece must be returned
+    for live_ranges in ([("x", 0, 100, 50, 1), ("y", 40, 60, 100, 2), ("z", 40, 60, 100, 2)],
+                        [("a", 1000, 1100, 50, 1), ("b", 1040, 1060, 100, 2),
+                         ("c", 1040, 1060, 100, 2)]):
+        allocator = CachingRegisterAllocator(2, cache=cache, mode=mode)
+        allocator.initialize(live_ranges)
+        allocation = allocator.allocate_registers()
+        assert allocation == cold_allocation(live_ranges, 2, mode)
+        reference = RegisterAllocator(2, mode=mode)
+        reference.initialize(live_ranges)
+        reference.allocate_registers()
+        report = verify_allocation(reference.interference_graph.variables, allocation, 2,
+                                   strict=mode == "timeline")
+        assert report.ok, report.as_dict()
+    assert cache.hits == 1
+
+def test_cache_key_depends_on_registers_and_mode():
+    canonical, _ = canonicalize([("x", 0, 10), ("y", 5, 15)])
+    keys = {cache_key(canonical, 2, "timeline"), cache_key(canonical, 3, "timeline"),
+            cache_key(canonical, 2, "linear_scan")}
+    assert len(keys) == 3
+
+def test_cache_lru_eviction_and_disk_store(tmp_path):
+    cache = AllocationCache(max_entries=2, directory=str(tmp_path))
+    for i in range(3):
+        allocator = CachingRegisterAllocator(2, cache=cache)
+        allocator.initialize([("x", 0, i + 1), ("y", 0, 1)])
+        allocator.allocate_registers()
+    assert len(cache) == 2 and cache.evictions == 1
+
+    # A fresh cache over the same directory is served from disk
+    reloaded = AllocationCache(max_entries=2, directory=str(tmp_path))
+    allocator = CachingRegisterAllocator(2, cache=reloaded)
+    allocator.initialize([("p", 7, 8), ("q", 7, 8)])
+    assert allocator.allocate_registers() == {"p": 0, "q": 1}
+    assert reloaded.disk_hits == 1 and reloaded.misses == 0
+
+# =========================
+# Tests for the command-line driver
+# =========================
+
+def test_cli_formats_agree(tmp_path, capsys):
+    rows = [(1, 0, 0, 10), (1, 1, 5, 15), (1, 2, 12, 20), (2, 0, 0, 4), (2, 1, 6, 9)]
+    (tmp_path / "ranges.csv").write_text(
+        "function,variable,start,end\n" + "".join(f"{f},{v},{s},{e}\n" for f, v, s, e in rows))
+    (tmp_path / "ranges.jsonl").write_text("".join(
+        json.dumps({"function": f, "variable": str(v), "start": s, "end": e}) + "\n"
+        for f, v, s, e in rows))
+    with open(tmp_path / "ranges.bin", "wb") as f:
+        cli.write_binary(rows, f)
+
+    outputs = []
+    for name in ("ranges.csv", "ranges.jsonl", "ranges.bin"):
+        assert cli.main([str(tmp_path / name), "-r", "2"]) == 0
+        outputs.append([json.loads(line) for line in capsys.readouterr().out.splitlines()])
+
+    assert [record["allocation"] for record in outputs[0]] == \
+        [record["allocation"] for record in outputs[1]] == \
+        [record["allocation"] for record in outputs[2]]
+    assert outputs[2][0] == {"function": 1, "allocation": {"0": 0, "1": 1, "2": 0}}
+
+def test_allocate_stream_is_lazy():
+    def rows():
+        yield ("f", "a", 0, 10)
+        yield ("f", "b", 5, 15)
+        yield ("g", "c", 0, 1)
+        raise AssertionError("read past the second function")
+
+    stream = cli.allocate_stream(rows(), 2, mode="linear_scan")
+    assert next(stream) == ("f", {"a": 0, "b": 1})
+
+# =========================
+# Tests for the allocation service
+# =========================
+
+def test_service_batches_pipelined_requests():
+    functions = [random_live_ranges(30, seed=seed) for seed in range(20)]
+
+    async def run():
+        server = AllocationServer(max_workers=0, batch_size=8, batch_delay=0.05, max_queue=4)
+        await server.start_tcp()
+        client = await AllocationClient.connect_tcp(*server.address)
+        try:
+            allocations = await asyncio.gather(*(client.allocate(live_ranges, 4, "linear_scan")
+                                                 for live_ranges in functions))
+            with pytest.raises(ValueError):
+                await client.allocate(functions[0], 4, "bogus")
+            stats = await client.stats()
+        finally:
+            await client.close()
+            await server.close()
+        return allocations, stats
+
+    allocations, stats = asyncio.run(run())
+    assert allocations == [batch.allocate_function(live_ranges, 4, "linear_scan")
+                           for live_ranges in functions]
+    assert stats["requests"] == 20 and stats["batches"] < 20
+    assert stats["queue_depth"] == 0 and stats["p50"] <= stats["p99"]
+
+def test_service_rejects_non_object_frames():
+    async def run():
+        server = AllocationServer(max_workers=0)
+        await server.start_tcp()
+        reader, writer = await asyncio.open_connection(*server.address)
+        try:
+            write_frame(writer, [1, 2, 3])
+            write_frame(writer, {"id": 7, "live_ranges": [["x", 0, 1]], "num_registers": 1,
+                                 "mode": "linear_scan"})
+            await writer.drain()
+            return await read_frame(reader), await read_frame(reader)
+        finally:
+            writer.close()
+            await writer.wait_closed()
+            await server.close()
+
+    rejected, answered = asyncio.run(run())
+    assert rejected["id"] is None and "JSON object" in rejected["error"]
+    # The connection stays usable after the bad frame
+    assert answered == {"id": 7, "allocation": {"x": 0}}
+
+def test_service_unix_socket_with_process_pool(tmp_path):
+    live_ranges = [("x", 0, 10), ("y", 5, 15, None, 0, [(5, 6), (12, 15)]), ("z", 7, 11)]
+
+    async def run():
+        server = AllocationServer(max_workers=1)
+        path = str(tmp_path / "regalloc.sock")
+        await server.start_unix(path)
+        client = await AllocationClient.connect_unix(path)
+        try:
+            return await client.allocate(live_ranges, 2, "coloring")
+        finally:
+            await client.close()
+            await server.close()
+
+    assert asyncio.run(run()) == batch.allocate_function(live_ranges, 2, "coloring")
+
+# =========================
+# Tests for the benchmark suite
+# =========================
+
+def test_benchmark_workloads_are_seeded():
+    for name, generator in benchmark.WORKLOADS.items():
+        live_ranges = generator(200, seed=5)
+        assert live_ranges == generator(200, seed=5), name
+        assert len(live_ranges) == 200
+        assert len({var for var, *_ in live_ranges}) == 200
+        assert all(start <= end for _, start, end, *_ in live_ranges)
+
+def test_benchmark_report_and_baseline():
+    report = benchmark.run_benchmarks(sizes=[50], registers=[4], track_memory=False)
+    assert len(report["results"]) == len(benchmark.WORKLOADS) * len(benchmark.ALLOCATORS)
+    assert benchmark.compare_to_baseline(report, report) == []
+
+    baseline = {"results": [dict(result, spills=result["spills"] - 1, seconds=result["seconds"] / 10)
+                            for result in report["results"]]}
+    regressions = benchmark.compare_to_baseline(report, baseline)
+    assert any("spills" in regression for regression in regressions)
+    assert any("time" in regression for regression in regressions)
+
+def test_timeline_zero_length_range():
+    allocator = RegisterAllocator(1)
+    allocator.initialize([("a", 5, 5), ("b", 6, 9)])
+    assert allocator.allocate_registers() == {"a": 0, "b": 0}
+
 # =========================
 # Main test runner
 # =========================
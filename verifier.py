@@ -0,0 +1,104 @@
+# verifier.py
+"""
+Allocation verifier.
+
+Checks an allocation against the live ranges it was made for, reporting
+every pair of overlapping variables that share a register, every register
+outside [0, num_registers) and every variable left without a register or
+a spill. It accepts the output of RegisterAllocator, NaiveAllocator or
+GraphColoring.colors (pass the spill candidates as `spilled`).
+
+    report = verify_allocation(live_ranges, allocation, num_registers)
+    if not report.ok:
+        print(report.conflicts)
+"""
+import heapq
+from collections.abc import Mapping
+
+from interference_graph import normalize_segments
+
+
+class VerificationReport:
+    def __init__(self):
+        self.conflicts = []     # (variable, variable, register) sharing a register while live
+        self.out_of_range = []  # (variable, register) outside the register file
+        self.unassigned = []    # variables with neither a register nor a spill
+        self.unknown = []       # allocated names that have no live range
+
+    @property
+    def ok(self):
+        return not (self.conflicts or self.out_of_range or self.unassigned or self.unknown)
+
+    def as_dict(self):
+        return {
+            "conflicts": list(self.conflicts),
+            "out_of_range": list(self.out_of_range),
+            "unassigned": list(self.unassigned),
+            "unknown": list(self.unknown),
+        }
+
+
+def _segments(live_ranges):
+    """Yield (name, segments) from live-range tuples or a name -> Variable mapping"""
+    if isinstance(live_ranges, Mapping):
+        for name, var in live_ranges.items():
+            yield name, var.segments
+        return
+    for name, start, end, *weights in live_ranges:
+        if len(weights) > 2 and weights[2] is not None:
+            yield name, normalize_segments(weights[2])
+        else:
+            yield name, [(start, end)]
+
+
+def verify_allocation(live_ranges, allocation, num_registers, spilled=(), strict=False):
+    """
+    Verify `allocation` (name -> register or 'spilled') in O(n log n + C)
+    for C conflicts.
+    live_ranges: live-range tuples as accepted by InterferenceGraph, or a
+                 graph's `variables` mapping
+    spilled: names that count as spilled even if absent from allocation
+    strict: ranges that only share an end point do not conflict, as in the
+            timeline allocator; by default end points are inclusive
+    Returns: VerificationReport
+
+    Segments are swept in start order. Each register keeps a min-heap of
+    the segments holding it, keyed by end point; a segment conflicts with
+    exactly the entries still in its register's heap when it starts.
+    """
+    report = VerificationReport()
+    spilled = set(spilled)
+    segments = []
+    seen = set()
+    for name, var_segments in _segments(live_ranges):
+        seen.add(name)
+        reg = allocation.get(name)
+        if reg == 'spilled' or (reg is None and name in spilled):
+            continue
+        if reg is None:
+            report.unassigned.append(name)
+            continue
+        if not (isinstance(reg, int) and 0 <= reg < num_registers):
+            report.out_of_range.append((name, reg))
+        for start, end in var_segments:
+            segments.append((start, end, name, reg))
+    report.unknown = [name for name in allocation if name not in seen]
+
+    segments.sort(key=lambda segment: (segment[0], segment[1]))
+    occupants = {}  # register -> heap of (end, start, name)
+    reported = set()
+    for start, end, name, reg in segments:
+        heap = occupants.setdefault(reg, [])
+        # Unless strict, a segment ending at `start` still holds the register
+        while heap and (heap[0][0] < start or (strict and heap[0][0] == start)):
+            heapq.heappop(heap)
+        for other_end, other_start, other in heap:
+            if other == name or (strict and other_start == start and start == end):
+                continue
+            # Ranges with holes can meet in more than one segment
+            pair = frozenset((other, name))
+            if pair not in reported:
+                reported.add(pair)
+                report.conflicts.append((other, name, reg))
+        heapq.heappush(heap, (end, start, name))
+    return report